@@ -4,17 +4,16 @@ import pandas as pd
 import zipfile
 import io
 
-from src.xml_reader import extrair_dados_xmls
-from src.nfse_reader import extrair_dados_nfses_xmls
+from src.xml_dispatcher import extrair_dados_fiscais
 from src.xml_editor import alterar_cfops_e_gerar_zip
 from src.nfse_editor import alterar_natureza_e_gerar_zip
-from src.utils import CFOP_MAP
+from src.utils import CFOP_MAP, XML_MAX_WORKERS
 from src.db import (
     interpretar_cfop_decomposto,
     buscar_tipo_operacao_emissor,
     salvar_tipo_operacao_emissor,
-    buscar_preferencia_empresa_fornecedor,
-    salvar_preferencia_empresa_fornecedor
+    buscar_preferencias_empresa_fornecedores,
+    salvar_preferencias_empresa_fornecedores
 )
 
 st.set_page_config(page_title="CollosFiscal Pro - NF-e e NFSe Inteligente", layout="wide")
@@ -34,10 +33,8 @@ if "selecionar_todos" not in st.session_state:
 
 # Função para cadastrar empresa
 def cadastrar_empresa(cnpj, razao_social, nome_fantasia):
-    from src.db import engine, Table, MetaData, insert
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
-    empresas_table = Table('empresas', metadata, schema='concilia', autoload_with=engine)
+    from src.db import engine, obter_tabela, insert
+    empresas_table = obter_tabela('empresas')
     with engine.connect() as conn:
         stmt = insert(empresas_table).values(cnpj=cnpj, nome=nome_fantasia, razao_social=razao_social)
         conn.execute(stmt)
@@ -45,10 +42,8 @@ def cadastrar_empresa(cnpj, razao_social, nome_fantasia):
 
 # Seleção da empresa no início da sessão com opção de cadastro
 if st.session_state.empresa_selecionada is None:
-    from src.db import engine, Table, MetaData
-    metadata = MetaData()
-    metadata.reflect(bind=engine)
-    empresas_table = Table('empresas', metadata, schema='concilia', autoload_with=engine)
+    from src.db import engine, obter_tabela
+    empresas_table = obter_tabela('empresas')
     with engine.connect() as conn:
         result = conn.execute(empresas_table.select())
         empresas = result.fetchall()
@@ -88,24 +83,19 @@ uploaded_files = st.file_uploader("📂 Envie os arquivos XML das NF-es e NFS-es
 if uploaded_files:
     # Só processa os arquivos se ainda não tiverem sido processados
     if st.session_state.df_geral is None:
-        files_copy_1 = []
-        files_copy_2 = []
-        for file in uploaded_files:
-            content = file.read()
-            b1 = io.BytesIO(content)
-            b1.name = file.name
-            files_copy_1.append(b1)
+        # Cada arquivo é lido uma vez; os mesmos bytes vão para o parse e para o ZIP de saída
+        arquivos = [(file.name, file.getvalue()) for file in uploaded_files]
+        progresso = st.progress(0.0, text="Lendo XMLs...")
+        df_geral, arquivos_dict, erros_leitura = extrair_dados_fiscais(
+            arquivos,
+            max_workers=XML_MAX_WORKERS,
+            ao_concluir=lambda concluidos, total: progresso.progress(concluidos / total, text=f"Lendo XMLs... {concluidos}/{total}"),
+        )
+        progresso.empty()
 
-            b2 = io.BytesIO(content)
-            b2.name = file.name
-            files_copy_2.append(b2)
-
-        df_nfe, arquivos_nfe = extrair_dados_xmls(files_copy_1)
-        df_nfse, arquivos_nfse = extrair_dados_nfses_xmls(files_copy_2)
-
-        st.session_state.df_geral = pd.concat([df_nfe, df_nfse], ignore_index=True)  # Atualizando df_geral no session state
-        arquivos_dict = {**arquivos_nfe, **arquivos_nfse}
+        st.session_state.df_geral = df_geral  # Atualizando df_geral no session state
         st.session_state.arquivos_dict = arquivos_dict  # Salva no session state
+        st.session_state.erros_leitura = erros_leitura  # Arquivos que não puderam ser lidos
 
         # Garante que as colunas existam
         if "tipo_operacao" not in st.session_state.df_geral.columns:
@@ -123,29 +113,30 @@ if uploaded_files:
         if "historico" not in st.session_state.df_geral.columns:
             st.session_state.df_geral["historico"] = ""
 
-        # Aplica preferências salvas no banco para a empresa selecionada
+        # Aplica preferências salvas no banco para a empresa selecionada (uma consulta para todos os fornecedores)
         empresa_id = st.session_state.empresa_selecionada
-        for cnpj in st.session_state.df_geral["cnpj_emissor"].unique():
-            pref = buscar_preferencia_empresa_fornecedor(empresa_id, cnpj)
-            if pref:
-                idxs = st.session_state.df_geral.index[st.session_state.df_geral["cnpj_emissor"] == cnpj].tolist()
-                for idx in idxs:
-                    if "tipo_operacao" in pref and pref["tipo_operacao"]:
-                        st.session_state.df_geral.at[idx, "tipo_operacao"] = pref["tipo_operacao"]
-                    if "data_nota" in pref and pref["data_nota"]:
-                        st.session_state.df_geral.at[idx, "data_nota"] = pref["data_nota"]
-                    if "complemento" in pref and pref["complemento"]:
-                        st.session_state.df_geral.at[idx, "complemento"] = pref["complemento"]
-                    if "debito" in pref and pref["debito"]:
-                        st.session_state.df_geral.at[idx, "debito"] = pref["debito"]
-                    if "credito" in pref and pref["credito"]:
-                        st.session_state.df_geral.at[idx, "credito"] = pref["credito"]
-                    if "historico" in pref and pref["historico"]:
-                        st.session_state.df_geral.at[idx, "historico"] = pref["historico"]
+        df_geral = st.session_state.df_geral
+        preferencias = buscar_preferencias_empresa_fornecedores(empresa_id, df_geral["cnpj_emissor"].unique())
+        if not preferencias.empty:
+            combinado = df_geral[["cnpj_emissor"]].merge(
+                preferencias.rename(columns={"cnpj_fornecedor": "cnpj_emissor"}), on="cnpj_emissor", how="left"
+            )
+            combinado.index = df_geral.index
+            # Só valores preenchidos na preferência substituem os da nota
+            for coluna in ["tipo_operacao", "data_nota", "complemento", "debito", "credito", "historico"]:
+                valores = combinado[coluna]
+                preenchidos = valores.notna() & valores.astype(str).ne("")
+                df_geral.loc[preenchidos, coluna] = valores[preenchidos]
 
-        if st.session_state.df_geral.empty:
-            st.error("Nenhuma nota válida encontrada.")
-            st.stop()
+    # Resumo dos arquivos com erro de leitura (os demais seguem normalmente)
+    erros_leitura = st.session_state.get("erros_leitura") or []
+    if erros_leitura:
+        with st.expander(f"⚠️ {len(erros_leitura)} arquivo(s) não puderam ser lidos"):
+            st.dataframe(pd.DataFrame(erros_leitura), use_container_width=True, hide_index=True)
+
+    if st.session_state.df_geral.empty:
+        st.error("Nenhuma nota válida encontrada.")
+        st.stop()
 
     st.subheader("🧾 Tabela de Notas (Filtros + Seleção)")
 
@@ -330,27 +321,24 @@ if uploaded_files:
     # Salvar tipos no banco
     if st.button("💾 Salvar tipos no Banco"):
         empresa_id = st.session_state.empresa_selecionada
-        for idx, row in st.session_state.df_geral.iterrows():
-            cnpj = row["cnpj_emissor"]
-            cfop_code = row["tipo_operacao"]
-            data_nota = row.get("data_nota", "")
-            complemento = row.get("complemento", "")
-            debito = row.get("debito", "")
-            credito = row.get("credito", "")
-            historico = row.get("historico", "")
-            if cnpj and cfop_code:
-                salvar_preferencia_empresa_fornecedor(
-                    empresa_id,
-                    cnpj,
-                    tipo_operacao=cfop_code,
-                    cfop=None,
-                    data_nota=data_nota,
-                    complemento=complemento,
-                    debito=debito,
-                    credito=credito,
-                    historico=historico
-                )
-        st.success("Preferências salvas no banco.")
+        df_geral = st.session_state.df_geral
+        # Notas com fornecedor e tipo definidos; para o mesmo fornecedor vale a última nota
+        colunas = ["cnpj_emissor", "tipo_operacao", "data_nota", "complemento", "debito", "credito", "historico"]
+        notas = df_geral.reindex(columns=colunas).astype(object)
+        notas = notas[notas["cnpj_emissor"].fillna("").astype(bool) & notas["tipo_operacao"].fillna("").astype(bool)]
+        notas = notas.drop_duplicates("cnpj_emissor", keep="last")
+        notas = notas.where(notas.notna(), None)
+        preferencias = (
+            notas.rename(columns={"cnpj_emissor": "cnpj_fornecedor"})
+            .assign(cfop=None)
+            .to_dict("records")
+        )
+        try:
+            salvar_preferencias_empresa_fornecedores(empresa_id, preferencias)
+        except Exception as e:
+            st.error(f"Erro ao salvar as preferências: {e}")
+        else:
+            st.success("Preferências salvas no banco.")
 
     # Gerar e exportar ZIP com XMLs alterados
     if st.button("📦 Gerar ZIP com XMLs alterados"):
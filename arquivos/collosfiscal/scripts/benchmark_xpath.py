@@ -0,0 +1,118 @@
+"""
+Compara a extração dos campos da NF-e por buscas com descendentes (.// em find/findtext)
+e pelos XPaths pré-compilados de src/xml_reader.py, sobre NF-es sintéticas no formato real.
+
+As árvores são parseadas antes da medição: só o tempo de extração é comparado.
+Também confere que as duas versões produzem os mesmos registros.
+Uso: python scripts/benchmark_xpath.py [notas] [itens_por_nota]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+from lxml import etree
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.xml_reader import NFE_NAMESPACE, extrair_registro_nfe
+
+N = "{" + NFE_NAMESPACE + "}"
+
+
+def extrair_registro_nfe_descendentes(root):
+    """Extração anterior, com uma busca .// por campo (referência da comparação)."""
+    infNFe = root.find(f".//{N}infNFe")
+    if infNFe is None:
+        return None
+    emit = root.find(f".//{N}emit")
+    if emit is not None:
+        cnpj_emissor = emit.findtext(f"{N}CNPJ", default="")
+        fornecedor = emit.findtext(f"{N}xNome", default="")
+    else:
+        cnpj_emissor = ""
+        fornecedor = ""
+    data_emissao = root.findtext(f".//{N}dhEmi", default="") or root.findtext(f".//{N}dEmi", default="")
+    numero_nota = root.findtext(f".//{N}nNF", default="")
+    return {
+        "chave": infNFe.get("Id", "").replace("NFe", ""),
+        "tipo": "NFe",
+        "fornecedor": fornecedor,
+        "cnpj_emissor": cnpj_emissor,
+        "valor_total": float(root.findtext(f".//{N}vNF", default="0")),
+        "cfop_atual": root.findtext(f".//{N}CFOP", default=""),
+        "credito_icms": float(root.findtext(f".//{N}vICMS", default="0")),
+        "data_nota": data_emissao,
+        "complemento": f"{cnpj_emissor} {fornecedor} {numero_nota}",
+    }
+
+
+def gerar_item(rng, n_item):
+    if rng.random() < 0.3:
+        # Simples Nacional: item sem vICMS
+        icms = "<ICMSSN102><orig>0</orig><CSOSN>102</CSOSN></ICMSSN102>"
+    else:
+        icms = (f"<ICMS00><orig>0</orig><CST>00</CST><modBC>3</modBC><vBC>100.00</vBC>"
+                f"<pICMS>18.00</pICMS><vICMS>{rng.uniform(1, 50):.2f}</vICMS></ICMS00>")
+    return (
+        f'<det nItem="{n_item}"><prod><cProd>{n_item:05d}</cProd><cEAN>SEM GTIN</cEAN>'
+        f"<xProd>PRODUTO {n_item}</xProd><NCM>84713012</NCM><CFOP>{rng.choice(['5102', '6102', '5405'])}</CFOP>"
+        f"<uCom>UN</uCom><qCom>1.0000</qCom><vUnCom>100.00</vUnCom><vProd>100.00</vProd></prod>"
+        f"<imposto><vTotTrib>10.00</vTotTrib><ICMS>{icms}</ICMS>"
+        f"<PIS><PISAliq><CST>01</CST><vBC>100.00</vBC><pPIS>1.65</pPIS><vPIS>1.65</vPIS></PISAliq></PIS>"
+        f"<COFINS><COFINSAliq><CST>01</CST><vBC>100.00</vBC><pCOFINS>7.60</pCOFINS><vCOFINS>7.60</vCOFINS></COFINSAliq></COFINS>"
+        f"</imposto></det>"
+    )
+
+
+def gerar_nfe(rng, numero, itens):
+    chave = f"{numero:044d}"
+    emitente = (f"<CNPJ>{rng.randrange(10**13, 10**14)}</CNPJ>" if rng.random() < 0.95
+                else f"<CPF>{rng.randrange(10**10, 10**11)}</CPF>")
+    nfe = (
+        f'<NFe xmlns="{NFE_NAMESPACE}"><infNFe Id="NFe{chave}" versao="4.00">'
+        f"<ide><cUF>42</cUF><natOp>VENDA</natOp><mod>55</mod><serie>1</serie><nNF>{numero}</nNF>"
+        f"<dhEmi>2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00-03:00</dhEmi><tpNF>1</tpNF></ide>"
+        f"<emit>{emitente}<xNome>FORNECEDOR {numero % 300} LTDA</xNome>"
+        f"<enderEmit><xLgr>RUA A</xLgr><nro>1</nro><xMun>FLORIANOPOLIS</xMun><UF>SC</UF></enderEmit>"
+        f"<IE>123456789</IE><CRT>3</CRT></emit>"
+        f"<dest><CNPJ>12345678000199</CNPJ><xNome>CLIENTE</xNome></dest>"
+        + "".join(gerar_item(rng, k) for k in range(1, itens + 1))
+        + f"<total><ICMSTot><vBC>0.00</vBC><vICMS>{rng.uniform(0, 500):.2f}</vICMS><vICMSDeson>0.00</vICMSDeson>"
+        f"<vProd>{itens * 100:.2f}</vProd><vNF>{itens * 100:.2f}</vNF></ICMSTot></total>"
+        f"<transp><modFrete>9</modFrete></transp><infAdic><infCpl>NOTA DE TESTE</infCpl></infAdic></infNFe>"
+        f'<Signature xmlns="http://www.w3.org/2000/09/xmldsig#"><SignedInfo/><SignatureValue>AAAA</SignatureValue></Signature>'
+        f"</NFe>"
+    )
+    if rng.random() < 0.1:
+        # NF-e avulsa, sem o protocolo de autorização
+        return nfe
+    return (
+        f'<nfeProc xmlns="{NFE_NAMESPACE}" versao="4.00">{nfe}'
+        f'<protNFe versao="4.00"><infProt><tpAmb>1</tpAmb><chNFe>{chave}</chNFe>'
+        f"<dhRecbto>2024-01-01T10:00:00-03:00</dhRecbto><nProt>1</nProt><cStat>100</cStat></infProt></protNFe>"
+        f"</nfeProc>"
+    )
+
+
+def medir(descricao, funcao, arvores):
+    inicio = time.perf_counter()
+    registros = [funcao(root) for root in arvores]
+    duracao = time.perf_counter() - inicio
+    print(f"{descricao:<26} {len(arvores):>7} notas  {duracao:8.3f}s  {len(arvores) / duracao:10.0f} notas/s")
+    return registros
+
+
+def main():
+    notas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    itens = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(0)
+    arvores = [etree.fromstring(gerar_nfe(rng, numero, rng.randint(1, itens)).encode()) for numero in range(1, notas + 1)]
+
+    antigos = medir("busca por descendentes", extrair_registro_nfe_descendentes, arvores)
+    novos = medir("XPath pré-compilado", extrair_registro_nfe, arvores)
+    print("registros idênticos:", antigos == novos)
+
+
+if __name__ == "__main__":
+    main()
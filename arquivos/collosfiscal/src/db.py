@@ -1,6 +1,11 @@
 import os
+import threading
+import time
 from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, select, insert, update
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from dotenv import load_dotenv
+import pandas as pd
 
 load_dotenv()  # Carrega variáveis do arquivo .env se existir
 
@@ -86,6 +91,34 @@ try:
 except Exception as e:
     print(f"Error creating tables: {e}")
 
+# 📋 Registro do esquema refletido (evita refletir o banco inteiro a cada execução do app)
+
+ESQUEMA_TTL_SEGUNDOS = int(os.getenv("SCHEMA_CACHE_TTL_SECONDS", 3600))
+_esquema_lock = threading.Lock()
+_esquema = {}  # (schema, tabela) -> (momento da reflexão, Table)
+
+def obter_tabela(nome, schema='concilia'):
+    """Retorna a tabela refletida do banco, reaproveitando a reflexão até expirar o TTL."""
+    chave = (schema, nome)
+    with _esquema_lock:
+        registro = _esquema.get(chave)
+        if registro is None or time.monotonic() - registro[0] > ESQUEMA_TTL_SEGUNDOS:
+            tabela = Table(nome, MetaData(), schema=schema, autoload_with=engine)
+            registro = (time.monotonic(), tabela)
+            _esquema[chave] = registro
+        return registro[1]
+
+def colunas_da_tabela(nome, schema='concilia'):
+    return [coluna.name for coluna in obter_tabela(nome, schema).columns]
+
+def tipos_das_colunas(nome, schema='concilia'):
+    return {coluna.name: coluna.type for coluna in obter_tabela(nome, schema).columns}
+
+def invalidar_esquema():
+    """Descarta as tabelas refletidas, forçando nova reflexão no próximo uso."""
+    with _esquema_lock:
+        _esquema.clear()
+
 # 📋 Funções para buscar interpretações
 
 def buscar_origem_destino(digito):
@@ -148,6 +181,32 @@ def buscar_preferencia_empresa_fornecedor(empresa_id, cnpj_fornecedor):
             return dict(result._mapping)
         return None
 
+COLUNAS_PREFERENCIA = ["tipo_operacao", "cfop", "debito", "credito", "historico", "data_nota", "complemento"]
+
+def _valor_empresa_id(tabela, empresa_id):
+    """empresa_id no tipo real da coluna no banco (pode ser texto), sem CAST na coluna, para usar o índice."""
+    return str(empresa_id) if isinstance(tabela.c.empresa_id.type, String) else int(empresa_id)
+
+def buscar_preferencias_empresa_fornecedores(empresa_id, cnpjs_fornecedores):
+    """Preferências da empresa para vários fornecedores em uma única consulta.
+
+    Retorna um DataFrame com uma linha por cnpj_fornecedor encontrado (o registro mais recente,
+    se houver repetidos) e as colunas de COLUNAS_PREFERENCIA.
+    """
+    cnpjs = [str(cnpj) for cnpj in dict.fromkeys(cnpjs_fornecedores) if cnpj]
+    colunas = ["cnpj_fornecedor"] + COLUNAS_PREFERENCIA
+    if not cnpjs:
+        return pd.DataFrame(columns=colunas)
+
+    tabela = obter_tabela('preferencias_fornecedor_empresa')
+    stmt = select(*(tabela.c[coluna] for coluna in colunas)).where(
+        (tabela.c.empresa_id == _valor_empresa_id(tabela, empresa_id)) &
+        (tabela.c.cnpj_fornecedor.in_(cnpjs))
+    ).order_by(tabela.c.id)
+    with engine.connect() as conn:
+        preferencias = pd.DataFrame(conn.execute(stmt).fetchall(), columns=colunas)
+    return preferencias.drop_duplicates("cnpj_fornecedor", keep="last").reset_index(drop=True)
+
 def salvar_preferencia_empresa_fornecedor(empresa_id, cnpj_fornecedor, tipo_operacao=None, cfop=None, debito=None, credito=None, historico=None, data_nota=None, complemento=None):
     print(f"Salvando preferência: empresa_id={empresa_id}, cnpj_fornecedor={cnpj_fornecedor}, tipo_operacao={tipo_operacao}, data_nota={data_nota}, complemento={complemento}")
     with engine.connect() as conn:
@@ -179,3 +238,38 @@ def salvar_preferencia_empresa_fornecedor(empresa_id, cnpj_fornecedor, tipo_oper
             )
         conn.execute(stmt)
         conn.commit()
+
+def salvar_preferencias_empresa_fornecedores(empresa_id, preferencias):
+    """Grava as preferências de vários fornecedores da empresa em um único upsert (uma transação).
+
+    `preferencias` é uma lista de dicts com cnpj_fornecedor e colunas de COLUNAS_PREFERENCIA;
+    para CNPJs repetidos vale o último. Retorna o número de fornecedores gravados.
+    """
+    por_fornecedor = {}
+    for preferencia in preferencias:
+        por_fornecedor[preferencia["cnpj_fornecedor"]] = preferencia
+    if not por_fornecedor:
+        return 0
+
+    tabela = obter_tabela('preferencias_fornecedor_empresa')
+    empresa = _valor_empresa_id(tabela, empresa_id)
+    linhas = [
+        {"empresa_id": empresa, "cnpj_fornecedor": cnpj, **{coluna: preferencia.get(coluna) for coluna in COLUNAS_PREFERENCIA}}
+        for cnpj, preferencia in por_fornecedor.items()
+    ]
+    stmt = pg_insert(tabela).values(linhas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabela.c.empresa_id, tabela.c.cnpj_fornecedor],
+        set_={coluna: stmt.excluded[coluna] for coluna in COLUNAS_PREFERENCIA},
+    )
+    try:
+        with engine.begin() as conn:
+            conn.execute(stmt)
+    except ProgrammingError as e:
+        if "no unique or exclusion constraint" in str(e):
+            raise RuntimeError(
+                "A restrição única uq_preferencias_empresa_fornecedor não existe no banco. "
+                "Execute database/schemas/schema_v4.sql antes de salvar as preferências."
+            ) from e
+        raise
+    return len(linhas)
@@ -7,6 +7,10 @@ load_dotenv()
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
 DEBUG = os.getenv("DEBUG", "False") == "True"
 
+# Leitura paralela dos XMLs: processos usados (vazio = nº de CPUs) e mínimo de arquivos para paralelizar
+XML_MAX_WORKERS = int(os.getenv("XML_MAX_WORKERS", 0)) or None
+XML_MIN_ARQUIVOS_PARALELO = int(os.getenv("XML_MIN_ARQUIVOS_PARALELO", 1000))
+
 # Mapa dos tipos de operação para seus respectivos CFOPs
 CFOP_MAP = {
     "Consumo - Dentro do Estado": "1556",
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from lxml import etree
+import pandas as pd
+
+from src.xml_reader import NFE_NAMESPACE, extrair_registro_nfe
+from src.nfse_reader import extrair_registro_nfse
+from src.utils import XML_MIN_ARQUIVOS_PARALELO
+
+# Colunas de df_geral, na ordem dos registros compactos (tuplas) devolvidos pelos workers
+COLUNAS_REGISTRO = (
+    "chave", "tipo", "fornecedor", "cnpj_emissor", "valor_total",
+    "cfop_atual", "credito_icms", "data_nota", "complemento"
+)
+# Arquivos enviados por tarefa (reduz a troca de mensagens com os processos)
+ARQUIVOS_POR_LOTE = 50
+
+def _extratores_por_raiz(root):
+    """Ordem dos extratores conforme o namespace da raiz: NF-e primeiro para o namespace do portal fiscal."""
+    if etree.QName(root).namespace == NFE_NAMESPACE:
+        return (("NFe", extrair_registro_nfe), ("NFSe", extrair_registro_nfse))
+    return (("NFSe", extrair_registro_nfse), ("NFe", extrair_registro_nfe))
+
+def extrair_registro(root):
+    """Envia a árvore já parseada ao extrator do seu tipo.
+
+    Retorna (tipo, registro); registro é None quando o XML não é NF-e nem NFS-e.
+    O outro extrator só é tentado, sobre a mesma árvore, se o indicado pela raiz não encontrar a nota.
+    """
+    for tipo, extrator in _extratores_por_raiz(root):
+        registro = extrator(root)
+        if registro is not None:
+            return tipo, registro
+    return None, None
+
+def _processar_arquivo(conteudo):
+    """Parse único e extração de um XML: devolve (lido, tipo, registro em tupla, erro)."""
+    try:
+        # Parse único por arquivo; a árvore é compartilhada pelos extratores
+        root = etree.fromstring(conteudo)
+    except Exception as e:
+        return False, None, None, str(e)
+    try:
+        tipo, registro = extrair_registro(root)
+    except Exception as e:
+        return True, None, None, str(e)
+    if registro is None:
+        return True, None, None, None
+    return True, tipo, tuple(registro[coluna] for coluna in COLUNAS_REGISTRO), None
+
+def _processar_lote(lote):
+    """Executado no processo filho: [(indice, bytes)] -> [(indice, lido, tipo, registro, erro)]."""
+    return [(indice,) + _processar_arquivo(conteudo) for indice, conteudo in lote]
+
+def extrair_dados_fiscais(arquivos, max_workers=None, ao_concluir=None):
+    """Lê NF-es e NFS-es em uma única passada, em paralelo quando há muitos arquivos.
+
+    `arquivos` é uma lista de (nome, bytes). Retorna:
+    - o DataFrame com as notas (NF-es antes das NFS-es, na ordem de envio), montado de uma vez;
+    - o dicionário nome -> bytes dos XMLs lidos, sem copiar o conteúdo;
+    - a lista de erros por arquivo, [{'arquivo', 'erro'}], sem interromper os demais.
+    `ao_concluir(concluidos, total)` é chamado a cada arquivo (ou lote) finalizado.
+    """
+    total = len(arquivos)
+    resultados = [None] * total
+    concluidos = 0
+
+    def registrar(itens):
+        nonlocal concluidos
+        for indice, *resultado in itens:
+            resultados[indice] = resultado
+        concluidos += len(itens)
+        if ao_concluir:
+            ao_concluir(concluidos, total)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    indexados = list(enumerate(conteudo for _, conteudo in arquivos))
+    lotes = [indexados[i:i + ARQUIVOS_POR_LOTE] for i in range(0, total, ARQUIVOS_POR_LOTE)]
+    max_workers = max(1, min(max_workers, len(lotes)))
+
+    # Abaixo do mínimo, o custo de subir os processos supera o ganho do paralelismo
+    if max_workers == 1 or total < XML_MIN_ARQUIVOS_PARALELO:
+        for lote in lotes:
+            registrar(_processar_lote(lote))
+    else:
+        # 'spawn' evita fork de um processo multithread (servidor do Streamlit)
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto) as executor:
+            futuros = {executor.submit(_processar_lote, lote): lote for lote in lotes}
+            for futuro in as_completed(futuros):
+                try:
+                    registrar(futuro.result())
+                except Exception as e:
+                    # Falha do próprio processo filho (ex.: worker encerrado)
+                    registrar([(indice, False, None, None, str(e)) for indice, _ in futuros[futuro]])
+
+    registros = {"NFe": [], "NFSe": []}
+    arquivos_dict = {}
+    erros = []
+    for (nome, conteudo), (lido, tipo, registro, erro) in zip(arquivos, resultados):
+        if lido:
+            arquivos_dict[nome] = conteudo
+        if erro:
+            erros.append({"arquivo": nome, "erro": erro})
+        elif registro is not None:
+            registros[tipo].append(registro)
+
+    df = pd.DataFrame.from_records(registros["NFe"] + registros["NFSe"], columns=list(COLUNAS_REGISTRO))
+    return df, arquivos_dict, erros
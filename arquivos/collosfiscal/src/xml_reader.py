@@ -3,6 +3,67 @@ import pandas as pd
 import io
 
 NFE_NAMESPACE = "http://www.portalfiscal.inf.br/nfe"
+NS = {"nfe": NFE_NAMESPACE}
+
+# XPaths pré-compilados. O infNFe é buscado por caminho absoluto (nfeProc autorizado ou NFe avulsa);
+# só layouts diferentes (lotes, envelopes) caem na busca por descendentes.
+_INF_NFE = etree.XPath("/nfe:nfeProc/nfe:NFe/nfe:infNFe | /nfe:NFe/nfe:infNFe", namespaces=NS)
+_INF_NFE_QUALQUER = etree.XPath("//nfe:infNFe", namespaces=NS)
+# Campos de ide, emit, total e do primeiro item, relativos ao infNFe, em uma única avaliação
+_CAMPOS = etree.XPath(
+    "nfe:ide/nfe:nNF | nfe:ide/nfe:dhEmi | nfe:ide/nfe:dEmi"
+    " | nfe:emit/nfe:CNPJ | nfe:emit/nfe:xNome"
+    " | nfe:det[1]/nfe:prod/nfe:CFOP | nfe:total/nfe:ICMSTot/nfe:vNF",
+    namespaces=NS,
+)
+# Primeiro vICMS na ordem do documento, como na busca original: o do primeiro item que o tenha, senão o do total
+_VICMS_ITEM = etree.XPath("nfe:det[nfe:imposto/nfe:ICMS/*/nfe:vICMS][1]/nfe:imposto/nfe:ICMS/*/nfe:vICMS", namespaces=NS)
+_VICMS_TOTAL = etree.XPath("nfe:total/nfe:ICMSTot/nfe:vICMS", namespaces=NS)
+
+def _textos(elementos):
+    """Texto do primeiro elemento de cada nome (mesma semântica de findtext)."""
+    textos = {}
+    for elemento in elementos:
+        textos.setdefault(etree.QName(elemento).localname, elemento.text or "")
+    return textos
+
+def extrair_registro_nfe(root):
+    """Extrai o registro de uma NF-e a partir da raiz já parseada (None se não for NF-e)."""
+    encontrados = _INF_NFE(root) or _INF_NFE_QUALQUER(root)
+    if not encontrados:
+        return None
+    infNFe = encontrados[0]
+
+    campos = _textos(_CAMPOS(infNFe))
+    cnpj_emissor = campos.get("CNPJ", "")
+    fornecedor = campos.get("xNome", "")
+
+    chave = infNFe.get("Id", "").replace("NFe", "")
+    valor_total = campos.get("vNF", "0")
+    cfop_atual = campos.get("CFOP", "")
+    vicms = _VICMS_ITEM(infNFe) or _VICMS_TOTAL(infNFe)
+    credito_icms = (vicms[0].text or "") if vicms else "0"
+
+    # Nova extração da data da nota
+    data_emissao = campos.get("dhEmi", "")
+    if not data_emissao:
+        data_emissao = campos.get("dEmi", "")
+
+    # Complemento: CNPJ + Razão Social + Número da Nota
+    numero_nota = campos.get("nNF", "")
+    complemento = f"{cnpj_emissor} {fornecedor} {numero_nota}"
+
+    return {
+        "chave": chave,
+        "tipo": "NFe",
+        "fornecedor": fornecedor,
+        "cnpj_emissor": cnpj_emissor,
+        "valor_total": float(valor_total),
+        "cfop_atual": cfop_atual,
+        "credito_icms": float(credito_icms),
+        "data_nota": data_emissao,
+        "complemento": complemento
+    }
 
 def extrair_dados_xmls(arquivos_xml):
     registros = []
@@ -17,43 +78,9 @@ def extrair_dados_xmls(arquivos_xml):
             # Salvar conteúdo do arquivo
             arquivos_dict[file.name] = file.getvalue()
 
-            infNFe = root.find(".//{http://www.portalfiscal.inf.br/nfe}infNFe")
-            if infNFe is None:
-                continue
-
-            emit = root.find(".//{http://www.portalfiscal.inf.br/nfe}emit")
-            if emit is not None:
-                cnpj_emissor = emit.findtext("{http://www.portalfiscal.inf.br/nfe}CNPJ", default="")
-                fornecedor = emit.findtext("{http://www.portalfiscal.inf.br/nfe}xNome", default="")
-            else:
-                cnpj_emissor = ""
-                fornecedor = ""
-
-            chave = infNFe.get("Id", "").replace("NFe", "")
-            valor_total = root.findtext(".//{http://www.portalfiscal.inf.br/nfe}vNF", default="0")
-            cfop_atual = root.findtext(".//{http://www.portalfiscal.inf.br/nfe}CFOP", default="")
-            credito_icms = root.findtext(".//{http://www.portalfiscal.inf.br/nfe}vICMS", default="0")
-
-            # Nova extração da data da nota
-            data_emissao = root.findtext(".//{http://www.portalfiscal.inf.br/nfe}dhEmi", default="")
-            if not data_emissao:
-                data_emissao = root.findtext(".//{http://www.portalfiscal.inf.br/nfe}dEmi", default="")
-
-            # Complemento: CNPJ + Razão Social + Número da Nota
-            numero_nota = root.findtext(".//{http://www.portalfiscal.inf.br/nfe}nNF", default="")
-            complemento = f"{cnpj_emissor} {fornecedor} {numero_nota}"
-
-            registros.append({
-                "chave": chave,
-                "tipo": "NFe",
-                "fornecedor": fornecedor,
-                "cnpj_emissor": cnpj_emissor,
-                "valor_total": float(valor_total),
-                "cfop_atual": cfop_atual,
-                "credito_icms": float(credito_icms),
-                "data_nota": data_emissao,
-                "complemento": complemento
-            })
+            registro = extrair_registro_nfe(root)
+            if registro is not None:
+                registros.append(registro)
 
         except Exception as e:
             print(f"Erro ao processar {file.name}: {e}")
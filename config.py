@@ -34,7 +34,36 @@ SUPPORTED_CSV_EXTENSIONS = ['.csv', '.txt']
 # Configurações de processamento
 MAX_FILE_SIZE_MB = 50
 CACHE_TTL_SECONDS = 300  # 5 minutos
+# Pool de conexões e limites das consultas (PostgreSQL/Supabase)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 0))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 20))  # segundos aguardando uma conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 300))  # segundos até reciclar uma conexão
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "sim")
+# Limite por comando em ms; 0 = não envia (o pooler de transações do Supabase pode recusar 'options')
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "conciliacontag")
+# Validade do esquema refletido das tabelas (colunas e tipos) mantido em memória
+SCHEMA_CACHE_TTL_SECONDS = int(os.getenv("SCHEMA_CACHE_TTL_SECONDS", 3600))
+# Número de processos usados para ler vários arquivos OFX em paralelo
+OFX_MAX_WORKERS = int(os.getenv("OFX_MAX_WORKERS", os.cpu_count() or 1))
+# Cache em disco dos arquivos já processados (chave = SHA-256 do conteúdo + versão do parser)
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", str(PROJECT_ROOT / ".cache" / "parse"))
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", 512))
+# Francesinhas a partir deste tamanho são lidas em modo streaming (memória limitada)
+FRANCESINHA_STREAMING_MIN_MB = float(os.getenv("FRANCESINHA_STREAMING_MIN_MB", 5))
+# Limite do CSV de histórico servido pelo download_button (o Streamlit mantém o arquivo inteiro em memória)
+HISTORICO_EXPORTACAO_MAX_MB = int(os.getenv("HISTORICO_EXPORTACAO_MAX_MB", 200))
+# Reimportação de arquivos já salvos: grava só as diferenças em vez de apagar e reinserir tudo
+IMPORTACAO_INCREMENTAL = os.getenv("IMPORTACAO_INCREMENTAL", "true").lower() in ("1", "true", "sim")
+# Tamanho do lote de nomes enviados ao nlp.pipe na classificação de sacados
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", 256))
+# Modelo spaCy (carregado só na primeira classificação) e componentes que o app não usa
+SPACY_MODEL = os.getenv("SPACY_MODEL", "pt_core_news_sm")
+SPACY_EXCLUDE = [c for c in os.getenv("SPACY_EXCLUDE", "parser,lemmatizer,morphologizer,attribute_ruler,senter").split(",") if c]
+# Pré-carrega o modelo em segundo plano ao iniciar o app
+SPACY_WARMUP = os.getenv("SPACY_WARMUP", "false").lower() in ("1", "true", "sim")
 
 # Configurações de logging
-LOG_LEVEL = "INFO"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s" 
\ No newline at end of file
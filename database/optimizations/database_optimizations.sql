@@ -31,6 +31,16 @@ ON transacoes_ofx(empresa_id, data);
 CREATE INDEX IF NOT EXISTS idx_francesinhas_empresa_dt_liquid 
 ON francesinhas(empresa_id, dt_liquid);
 
+-- Histórico paginado por chave (keyset) em (created_at, id), por empresa
+CREATE INDEX IF NOT EXISTS idx_transacoes_ofx_empresa_created_id 
+ON transacoes_ofx(empresa_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_francesinhas_empresa_created_id 
+ON francesinhas(empresa_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_lancamentos_conciliacao_empresa_created_id 
+ON lancamentos_conciliacao(empresa_id, created_at DESC, id DESC);
+
 -- 4. Configurações de performance do PostgreSQL
 -- Execute estas configurações no postgresql.conf ou via ALTER SYSTEM
 
@@ -0,0 +1,35 @@
+-- =================================================================
+-- SCHEMA V3 - TABELAS DE APOIO À CONCILIAÇÃO
+-- =================================================================
+
+-- Regras de lançamento (débito/crédito/histórico) específicas de cada empresa.
+-- São somadas às regras padrão definidas em src/processors/regras_lancamento.py
+-- e avaliadas em ordem de prioridade (menor primeiro).
+CREATE TABLE IF NOT EXISTS regras_lancamento (
+    id SERIAL PRIMARY KEY,
+    empresa_id INTEGER NOT NULL REFERENCES empresas(id) ON DELETE CASCADE,
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    tipo VARCHAR(10) NOT NULL,                 -- 'CREDIT' ou 'DEBIT'
+    campo VARCHAR(10) NOT NULL,                -- 'memo' ou 'payee'
+    padrao TEXT NOT NULL,                      -- texto ou expressão regular
+    regex BOOLEAN NOT NULL DEFAULT FALSE,      -- TRUE se padrao for expressão regular
+    maiusculas BOOLEAN NOT NULL DEFAULT TRUE,  -- compara com o campo em maiúsculas
+    debito VARCHAR(255),
+    credito VARCHAR(255),
+    historico VARCHAR(255),
+    ativo BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CHECK (tipo IN ('CREDIT', 'DEBIT')),
+    CHECK (campo IN ('memo', 'payee'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_regras_lancamento_empresa_id ON regras_lancamento(empresa_id);
+
+-- Cache de classificação de sacados (PF/PJ), preenchido pelo app na conciliação.
+-- Nomes já classificados não passam novamente pelo spaCy.
+CREATE TABLE IF NOT EXISTS sacado_classificacao (
+    sacado TEXT PRIMARY KEY,
+    classificacao VARCHAR(20) NOT NULL,         -- 'PF' ou 'PJ'
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,40 @@
+-- =================================================================
+-- SCHEMA V4 - PREFERÊNCIAS DE FORNECEDOR (COLLOSFISCAL)
+-- =================================================================
+
+-- Uma preferência por empresa e fornecedor. A restrição única é o alvo do
+-- INSERT ... ON CONFLICT (empresa_id, cnpj_fornecedor) de "Salvar tipos no Banco"
+-- (salvar_preferencias_empresa_fornecedores em arquivos/collosfiscal/src/db.py)
+-- e o seu índice atende à busca em lote das preferências.
+--
+-- Execute uma vez, em uma transação. Antes de criar a restrição, remove as linhas
+-- repetidas de (empresa_id, cnpj_fornecedor), MANTENDO A DE MAIOR id (a gravada por último).
+-- Como o salvamento antigo atualizava todas as repetidas, elas costumam ter os mesmos valores;
+-- confira antes com a consulta abaixo se quiser revisar o que será removido.
+--
+--   SELECT empresa_id, cnpj_fornecedor, count(*)
+--   FROM concilia.preferencias_fornecedor_empresa
+--   GROUP BY empresa_id, cnpj_fornecedor HAVING count(*) > 1;
+
+BEGIN;
+
+DELETE FROM concilia.preferencias_fornecedor_empresa antiga
+USING concilia.preferencias_fornecedor_empresa recente
+WHERE antiga.empresa_id = recente.empresa_id
+  AND antiga.cnpj_fornecedor = recente.cnpj_fornecedor
+  AND antiga.id < recente.id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'uq_preferencias_empresa_fornecedor'
+    ) THEN
+        ALTER TABLE concilia.preferencias_fornecedor_empresa
+        ADD CONSTRAINT uq_preferencias_empresa_fornecedor UNIQUE (empresa_id, cnpj_fornecedor);
+    END IF;
+END $$;
+
+-- O índice da restrição substitui o índice simples criado pela versão anterior deste arquivo
+DROP INDEX IF EXISTS concilia.idx_preferencias_empresa_fornecedor;
+
+COMMIT;
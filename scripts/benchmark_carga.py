@@ -0,0 +1,67 @@
+"""
+Compara a vazão (linhas/s) da gravação com to_sql padrão e com inserir_em_massa (COPY).
+
+Usa o banco configurado no .env (SUPABASE_*) e uma tabela temporária, descartada ao final.
+Uso: python scripts/benchmark_carga.py [linhas]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.database.carga import inserir_em_massa
+
+
+def gerar_lancamentos(linhas):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'empresa_id': 1,
+        'conciliacao_id': 1,
+        'debito': rng.integers(10000, 99999, linhas).astype(str),
+        'credito': '',
+        'historico': '78',
+        'data': pd.Timestamp('2024-01-01').date(),
+        'valor': [f"{v:.2f}".replace('.', ',') for v in rng.uniform(1, 5000, linhas)],
+        'complemento': [f"C - PIX RECEBIDO | CLIENTE {i % 500}" for i in range(linhas)],
+        'origem': 'extrato.ofx',
+    })
+
+
+def medir(conn, descricao, funcao, linhas):
+    conn.execute(text("TRUNCATE bench_lancamentos"))
+    inicio = time.perf_counter()
+    funcao()
+    duracao = time.perf_counter() - inicio
+    print(f"{descricao:<22} {linhas:>8} linhas  {duracao:8.2f}s  {linhas / duracao:10.0f} linhas/s")
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    load_dotenv()
+    engine = create_engine(
+        f"postgresql+psycopg2://{os.getenv('SUPABASE_USER')}:{os.getenv('SUPABASE_PASSWORD')}@"
+        f"{os.getenv('SUPABASE_HOST')}:{os.getenv('SUPABASE_PORT')}/{os.getenv('SUPABASE_DB_NAME')}",
+        connect_args={"sslmode": "require"},
+    )
+    df = gerar_lancamentos(linhas)
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TEMP TABLE bench_lancamentos (
+                empresa_id INTEGER, conciliacao_id INTEGER, debito VARCHAR(255), credito VARCHAR(255),
+                historico VARCHAR(255), data DATE, valor VARCHAR(50), complemento TEXT, origem VARCHAR(255)
+            ) ON COMMIT DROP
+        """))
+        medir(conn, "to_sql (padrão)", lambda: df.to_sql('bench_lancamentos', conn, if_exists='append', index=False), linhas)
+        medir(conn, "inserir_em_massa", lambda: inserir_em_massa(conn, df, 'bench_lancamentos'), linhas)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,43 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import re
-from datetime import datetime
-from ofxparse import OfxParser
 import io
+import logging
 import zipfile
 import os
+import tempfile
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
-import sqlalchemy
-import spacy
-import hashlib
+import sys
+from pathlib import Path
+
+# Garante que a raiz do projeto esteja no sys.path (o Streamlit adiciona apenas src/core)
+RAIZ_PROJETO = Path(__file__).resolve().parents[2]
+if str(RAIZ_PROJETO) not in sys.path:
+    sys.path.insert(0, str(RAIZ_PROJETO))
+
+import config
+
+# Logs de instrumentação dos módulos (carga do spaCy, vazão das gravações, reflexão do esquema).
+# Sem um handler na raiz, as mensagens INFO seriam descartadas; basicConfig não faz nada nos reruns.
+logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+
+from src.database.carga import inserir_em_massa, sincronizar_incremental
+from src.database.esquema import colunas_da_tabela, invalidar_esquema
+from src.database.historico import (
+    TABELAS_HISTORICO, TAMANHO_PAGINA, buscar_pagina_historico, contar_historico, exportar_historico_csv, listar_origens
+)
+from src.database.pool import QueuePoolMedido
+from src.processors.cache import ler_com_cache
+from src.processors.classificacao import classificar_serie
+from src.processors.conciliacao import aplicar_regras_salvas, criar_chaves_regra, gerar_hashes
+from src.processors.francesinha import LINHAS_DERIVADAS, VERSAO_PARSER_FRANCESINHA, adicionar_linhas_derivadas, ler_francesinha
+from src.processors.modelo_nlp import aquecer_em_segundo_plano, obter_modelo
+from src.processors.ofx import processar_ofx_paralelo
+from src.processors.regras_lancamento import REGRAS_LANCAMENTO_PADRAO, aplicar_regras_lancamento, compilar_regras
+from src.utils.edicoes import aplicar_edicoes, desfazer_ultima, linhas_alteradas, registrar_alteracoes
+from src.utils.exportacao_csv import csv_memorizado
+from src.utils.indice_busca import IndiceBusca
 
 # --- Função para detectar ambiente ---
 def is_streamlit_cloud():
@@ -32,12 +58,11 @@ else:
     def get_config(key):
         return os.getenv(key, "")
 
-# --- Carregamento de Modelos e Recursos com Cache ---
-@st.cache_resource
+# --- Carregamento de Modelos e Recursos ---
 def carregar_modelo_spacy():
-    """Carrega o modelo spaCy para português e o coloca em cache."""
+    """Retorna o modelo spaCy para português, carregando-o só na primeira classificação."""
     try:
-        return spacy.load('pt_core_news_sm')
+        return obter_modelo(config.SPACY_MODEL, config.SPACY_EXCLUDE)
     except OSError:
         st.error("""
         ❌ **Modelo 'pt_core_news_sm' não encontrado**
@@ -55,17 +80,6 @@ def carregar_modelo_spacy():
         """)
         return None
 
-# --- Constantes ---
-COMPANY_SUFFIXES = [
-    'LTDA', 'S/A', 'SA', 'ME', 'EIRELI', 'CIA', 'MEI', 'EPP', 'EIRELE', 'S.A', 
-    'ASSOCIACAO', 'SEGURANCA', 'AUTOMACAO', 'ROBOTICA', 'TECNOLOGIA', 
-    'SOLUCOES', 'COMERCIO', 'FERRAMENTAS', 'CFC', 'CORRESPONDENTE', 
-    'PET SERVICE', 'ORGANIZACAO', 'INSTALACOES', 'TREINAMENTOS', 
-    'GREMIO', 'IGREJA', 'INDUSTRIA', 'SINDICATO', 'CONSTRUTORA', 'SOFTWARE', 
-    'MOTORES', 'ARMAZENAGEM', 'CONTABEIS', 'ACO', 'EQUIPAMENTOS', 
-    'EXPRESS', 'TRANSPORTES'
-]
-
 # --- Conexão com o Banco de Dados (PostgreSQL) ---
 @st.cache_resource
 def init_connection():
@@ -102,17 +116,25 @@ def init_connection():
             f"{get_config('SUPABASE_PORT')}/{get_config('SUPABASE_DB_NAME')}"
         )
         
-        # Criar engine com configurações otimizadas para Streamlit Cloud
+        connect_args = {
+            "sslmode": "require",     # SSL obrigatório para Supabase
+            "connect_timeout": 10,    # Timeout de conexão
+            "application_name": config.DB_APPLICATION_NAME,
+        }
+        if config.DB_STATEMENT_TIMEOUT_MS:
+            # Só quando configurado: salvamentos grandes (COPY/sincronização) podem passar de qualquer limite fixo
+            connect_args["options"] = f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"
+
+        # Criar engine com pool configurável (config.py / variáveis DB_*)
         engine = create_engine(
             db_url,
-            pool_recycle=300,      # Reciclar conexões a cada 5 min
-            pool_pre_ping=True,    # Verificar conexões antes de usar
-            pool_timeout=20,       # Timeout para conexões
-            max_overflow=0,        # Não permitir overflow de conexões
-            connect_args={
-                "sslmode": "require",     # SSL obrigatório para Supabase
-                "connect_timeout": 10     # Timeout de conexão
-            }
+            poolclass=QueuePoolMedido,               # Mede o tempo de espera por conexão
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_recycle=config.DB_POOL_RECYCLE,     # Reciclar conexões periodicamente
+            pool_pre_ping=config.DB_POOL_PRE_PING,   # Verificar conexões antes de usar
+            pool_timeout=config.DB_POOL_TIMEOUT,     # Timeout aguardando conexão livre
+            connect_args=connect_args,
         )
         
         # Testar conexão
@@ -146,7 +168,9 @@ def init_connection():
         st.stop()
 
 # --- Inicialização dos recursos ---
-nlp = carregar_modelo_spacy()
+# O modelo spaCy não é carregado aqui: só na primeira classificação ou pelo aquecimento opcional
+if config.SPACY_WARMUP:
+    aquecer_em_segundo_plano(config.SPACY_MODEL, config.SPACY_EXCLUDE)
 engine = init_connection()
 
 # --- Funções do Banco de Dados (ANTIGAS E NOVAS) ---
@@ -230,11 +254,17 @@ def verificar_conciliacao_existente(empresa_id, df):
 
 # --- Novas Funções de Persistência (Estrutura V2) ---
 
-def salvar_dados_importados(df, tipo_arquivo, empresa_id, total_arquivos):
+def salvar_dados_importados(df, tipo_arquivo, empresa_id, total_arquivos, incremental=None):
     """Cria um registro de importação e salva os dados brutos processados,
-    sobrescrevendo quaisquer dados existentes dos mesmos arquivos de origem."""
+    sobrescrevendo quaisquer dados existentes dos mesmos arquivos de origem.
+
+    No modo incremental (padrão: config.IMPORTACAO_INCREMENTAL), só as linhas que mudaram
+    são apagadas/inseridas; as idênticas às já gravadas são mantidas e apenas passam a
+    apontar para a nova importação (importacao_id), como no modo que apaga e reinsere."""
     if df.empty or empresa_id is None:
         return 0
+    if incremental is None:
+        incremental = config.IMPORTACAO_INCREMENTAL
     
     tabela_destino = 'transacoes_ofx' if tipo_arquivo == 'OFX' else 'francesinhas'
 
@@ -253,7 +283,8 @@ def salvar_dados_importados(df, tipo_arquivo, empresa_id, total_arquivos):
         trans = conn.begin()
         try:
             # ANTES DE TUDO: Deleta registros existentes para os mesmos arquivos de origem
-            if arquivos_sendo_salvos:
+            # (no modo incremental a remoção é feita depois, apenas das linhas que sumiram)
+            if arquivos_sendo_salvos and not incremental:
                 # A coluna no DB é sempre 'arquivo_origem'
                 delete_query = text(f"DELETE FROM {tabela_destino} WHERE empresa_id = :empresa_id AND arquivo_origem = ANY(:arquivos)")
                 conn.execute(delete_query, {"empresa_id": empresa_id, "arquivos": arquivos_sendo_salvos})
@@ -289,16 +320,31 @@ def salvar_dados_importados(df, tipo_arquivo, empresa_id, total_arquivos):
                     df_db = df_db.rename(columns={'id': 'id_transacao_ofx'})
             
             # Garante que apenas colunas existentes na tabela sejam enviadas
-            colunas_da_tabela = [c.name for c in sqlalchemy.Table(tabela_destino, sqlalchemy.MetaData(), autoload_with=conn).columns]
-            colunas_para_manter = [col for col in df_db.columns if col in colunas_da_tabela]
+            colunas_tabela = colunas_da_tabela(conn, tabela_destino, ttl=config.SCHEMA_CACHE_TTL_SECONDS)
+            colunas_para_manter = [col for col in df_db.columns if col in colunas_tabela]
             df_db_final = df_db[colunas_para_manter]
 
-            df_db_final.to_sql(tabela_destino, conn, if_exists='append', index=False)
+            if incremental:
+                resultado = sincronizar_incremental(
+                    conn, df_db_final, tabela_destino,
+                    "empresa_id = :empresa_id AND arquivo_origem = ANY(:arquivos)",
+                    {"empresa_id": empresa_id, "arquivos": arquivos_sendo_salvos},
+                    colunas_fixas={'importacao_id': importacao_id},
+                )
+            else:
+                inserir_em_massa(conn, df_db_final, tabela_destino)
             
             trans.commit()
+            if incremental:
+                st.caption(
+                    f"🔁 Importação incremental: {resultado['inseridas']} novas, "
+                    f"{resultado['removidas']} removidas, {resultado['mantidas']} inalteradas."
+                )
             return len(df_db_final)
         except Exception as e:
             trans.rollback()
+            # A falha pode vir de uma mudança de esquema: força nova reflexão no próximo salvamento
+            invalidar_esquema()
             st.error(f"Erro ao salvar dados de {tipo_arquivo}: {e}")
             return 0
 
@@ -344,50 +390,29 @@ def salvar_conciliacao_final(df_conciliacao, empresa_id, origens_para_sobrescrev
                 'histórico': 'historico'
             }, inplace=True)
 
-            df_db.to_sql('lancamentos_conciliacao', conn, if_exists='append', index=False)
+            # Envia apenas as colunas que existem na tabela
+            colunas_tabela = colunas_da_tabela(conn, 'lancamentos_conciliacao', ttl=config.SCHEMA_CACHE_TTL_SECONDS)
+            df_db = df_db[[col for col in df_db.columns if col in colunas_tabela]]
+
+            inserir_em_massa(conn, df_db, 'lancamentos_conciliacao')
             
             # 3. Salva as regras de conciliação para uso futuro
-            salvar_regras_conciliacao(conn, df_conciliacao, empresa_id)
+            regras_inseridas, regras_atualizadas = salvar_regras_conciliacao(conn, df_conciliacao, empresa_id)
 
             trans.commit()
+            st.caption(f"📘 Regras de conciliação: {regras_inseridas} novas, {regras_atualizadas} atualizadas.")
             return len(df_db)
         except Exception as e:
             trans.rollback()
+            invalidar_esquema()
             st.error(f"Erro ao salvar conciliação final: {e}")
             return 0
 
-def criar_chave_regra(row):
-    """Cria uma chave de regra estável e única a partir do complemento, baseada na origem do lançamento."""
-    complemento = str(row.get('complemento', ''))
-    origem = str(row.get('origem', '')).lower()
-    
-    # Para Juros de Mora: usa o texto antes do primeiro pipe
-    if 'juros de mora' in origem:
-        return complemento.split('|')[0].strip()
-
-    # Regra para Francesinha: usa o texto antes do primeiro pipe
-    if 'francesinha' in origem:
-        return complemento.split('|')[0].strip()
-        
-    # Regra padrão (OFX e outros)
-    parts = complemento.split('|')
-    if len(parts) > 2:
-        # Usa o texto até o segundo pipe
-        return f"{parts[0].strip()} | {parts[1].strip()}"
-    else:
-        # Se tiver um ou nenhum pipe, usa o complemento inteiro como chave
-        return complemento.strip()
-
-def gerar_hash(texto):
-    """Gera um hash SHA256 para um texto."""
-    if not texto:
-        return None
-    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
-
 def salvar_regras_conciliacao(conn, df_regras, empresa_id):
-    """Salva as regras de conciliação (combinação de complemento, contas) no banco de dados."""
+    """Salva as regras de conciliação (combinação de complemento, contas) no banco de dados.
+    Retorna a quantidade de regras inseridas e de regras atualizadas."""
     if df_regras.empty or empresa_id is None:
-        return 0
+        return 0, 0
     
     regras_para_salvar = df_regras.copy()
     # Remove linhas onde as contas principais não estão preenchidas
@@ -395,51 +420,58 @@ def salvar_regras_conciliacao(conn, df_regras, empresa_id):
     regras_para_salvar = regras_para_salvar[(regras_para_salvar['crédito'] != '') | (regras_para_salvar['débito'] != '')]
     
     if regras_para_salvar.empty:
-        return 0
+        return 0, 0
         
     # Gera a chave estável para a regra usando a nova lógica
-    regras_para_salvar['chave_regra'] = regras_para_salvar.apply(criar_chave_regra, axis=1)
+    regras_para_salvar['chave_regra'] = criar_chaves_regra(regras_para_salvar)
     regras_para_salvar.dropna(subset=['chave_regra'], inplace=True) # Remove linhas sem chave (ex: Juros)
-    regras_para_salvar['complemento_hash'] = regras_para_salvar['chave_regra'].apply(gerar_hash)
+    regras_para_salvar['complemento_hash'] = gerar_hashes(regras_para_salvar['chave_regra'])
 
-    # Renomeia as colunas ANTES de criar o dicionário para a query
+    # Renomeia as colunas ANTES de montar os arrays da query
     regras_para_salvar.rename(columns={
         'débito': 'debito',
         'crédito': 'credito',
         'histórico': 'historico'
     }, inplace=True)
 
-    # Prepara a query de UPSERT (INSERT ... ON CONFLICT)
+    # Uma regra por hash (a última linha prevalece, como no UPSERT linha a linha)
+    regras_para_salvar = regras_para_salvar.dropna(subset=['complemento_hash']).drop_duplicates('complemento_hash', keep='last')
+    if regras_para_salvar.empty:
+        return 0, 0
+
+    # UPSERT (INSERT ... ON CONFLICT) de todas as regras em um único comando, a partir de arrays.
+    # xmax = 0 identifica as linhas recém-inseridas (nas atualizadas, xmax recebe o id da transação).
     query = text("""
         INSERT INTO concilia.regras_conciliacao (empresa_id, complemento_hash, complemento_texto, debito, credito, historico, last_used)
-        VALUES (:empresa_id, :complemento_hash, :complemento, :debito, :credito, :historico, CURRENT_TIMESTAMP)
+        SELECT :empresa_id, r.complemento_hash, r.complemento, r.debito, r.credito, r.historico, CURRENT_TIMESTAMP
+        FROM unnest(
+            CAST(:hashes AS text[]), CAST(:complementos AS text[]),
+            CAST(:debitos AS text[]), CAST(:creditos AS text[]), CAST(:historicos AS text[])
+        ) AS r(complemento_hash, complemento, debito, credito, historico)
         ON CONFLICT (empresa_id, complemento_hash) DO UPDATE SET
             debito = EXCLUDED.debito,
             credito = EXCLUDED.credito,
             historico = EXCLUDED.historico,
             complemento_texto = EXCLUDED.complemento_texto,
-            last_used = CURRENT_TIMESTAMP;
+            last_used = CURRENT_TIMESTAMP
+        RETURNING (xmax = 0) AS inserida;
     """)
-    
-    # Executa em lote
-    regras_dict = regras_para_salvar[['complemento', 'debito', 'credito', 'historico', 'complemento_hash']].to_dict('records')
-    for regra in regras_dict:
-        conn.execute(query, {
-            "empresa_id": empresa_id,
-            "complemento_hash": regra['complemento_hash'],
-            "complemento": regra['complemento'],
-            "debito": regra['debito'],
-            "credito": regra['credito'],
-            "historico": regra['historico']
-        })
-    
-    return len(regras_dict)
+    result = conn.execute(query, {
+        "empresa_id": empresa_id,
+        "hashes": regras_para_salvar['complemento_hash'].tolist(),
+        "complementos": regras_para_salvar['complemento'].astype(str).tolist(),
+        "debitos": regras_para_salvar['debito'].astype(str).tolist(),
+        "creditos": regras_para_salvar['credito'].astype(str).tolist(),
+        "historicos": regras_para_salvar['historico'].astype(str).tolist(),
+    })
+    inseridas = sum(1 for row in result if row.inserida)
+    return inseridas, len(regras_para_salvar) - inseridas
 
 @st.cache_data(ttl=300) # Cache por 5 minutos
 def carregar_regras_conciliacao(empresa_id):
-    """Carrega as regras de conciliação salvas para a empresa ativa."""
+    """Carrega as regras de conciliação salvas para a empresa ativa (DataFrame indexável por complemento_hash)."""
     if not empresa_id:
-        return {}
+        return pd.DataFrame()
     try:
         with engine.connect() as conn:
             query = text("""
@@ -447,108 +479,137 @@ def carregar_regras_conciliacao(empresa_id):
                 FROM concilia.regras_conciliacao 
                 WHERE empresa_id = :empresa_id
             """)
-            result = conn.execute(query, {"empresa_id": empresa_id})
-            # Transforma em um dicionário para lookup rápido: {'hash': {'debito': '1', 'credito': '2', ...}}
-            return {row._mapping['complemento_hash']: dict(row._mapping) for row in result}
+            return pd.read_sql(query, conn, params={"empresa_id": empresa_id})
     except Exception as e:
         # Se a tabela não existir, não mostra um aviso, apenas retorna vazio.
         if "does not exist" in str(e):
-            return {}
+            return pd.DataFrame()
         st.warning(f"Não foi possível carregar as regras de conciliação salvas. Detalhes: {e}")
-        return {}
-
-def carregar_dados_historicos(empresa_id, tabela):
-    """Carrega dados históricos de uma tabela para a empresa ativa."""
-    if not empresa_id:
         return pd.DataFrame()
+
+def exibir_historico_paginado(tabela, empresa_id, chave):
+    """Mostra o histórico da tabela com filtros, total contado no banco e navegação por páginas (keyset)."""
     try:
         with engine.connect() as conn:
-            query = text(f"SELECT * FROM {tabela} WHERE empresa_id = :empresa_id ORDER BY created_at DESC")
-            return pd.read_sql(query, conn, params={"empresa_id": empresa_id})
+            origens = listar_origens(conn, tabela, empresa_id)
     except Exception as e:
         st.warning(f"Não foi possível carregar o histórico de '{tabela}'. A tabela existe? Detalhes: {e}")
-        return pd.DataFrame()
+        return
+
+    col_periodo, col_origem, col_conta = st.columns([2, 2, 1])
+    periodo = col_periodo.date_input("Período", value=(), key=f"{chave}_periodo", format="DD/MM/YYYY")
+    origem = col_origem.selectbox("Origem", options=[""] + origens, key=f"{chave}_origem")
+    conta = ''
+    if TABELAS_HISTORICO[tabela]['colunas_conta']:
+        conta = col_conta.text_input("Conta", key=f"{chave}_conta").strip()
+
+    filtros = {
+        'data_inicio': periodo[0] if len(periodo) > 0 else None,
+        'data_fim': periodo[1] if len(periodo) > 1 else None,
+        'origem': origem or None,
+        'conta': conta or None,
+    }
+
+    # Pilha de cursores das páginas visitadas; reinicia quando os filtros mudam
+    estado = st.session_state.setdefault(f"{chave}_paginacao", {'filtros': None, 'cursores': [None]})
+    if estado['filtros'] != filtros:
+        estado['filtros'] = filtros
+        estado['cursores'] = [None]
 
-# --- Funções de Regras de Negócio para Conciliação ---
+    try:
+        with engine.connect() as conn:
+            total = contar_historico(conn, tabela, empresa_id, **filtros)
+            pagina, proximo_cursor = buscar_pagina_historico(
+                conn, tabela, empresa_id, cursor=estado['cursores'][-1], limite=TAMANHO_PAGINA, **filtros
+            )
+    except Exception as e:
+        st.warning(f"Não foi possível carregar o histórico de '{tabela}'. Detalhes: {e}")
+        return
+
+    numero_pagina = len(estado['cursores'])
+    if pagina.empty and numero_pagina == 1:
+        st.write("Nenhum registro encontrado no histórico.")
+        return
+
+    total_paginas = max(1, -(-total // TAMANHO_PAGINA))
+    st.caption(f"{total} registros · página {numero_pagina} de {total_paginas}")
+    if pagina.empty:
+        # Página seguinte vazia (registros removidos ou total múltiplo do tamanho da página): a navegação continua disponível
+        st.info("Nenhum registro nesta página.")
+    else:
+        st.dataframe(pagina, use_container_width=True)
+
+    col_primeira, col_anterior, col_proxima, _ = st.columns([1, 1, 1, 3])
+    if col_primeira.button("⏮️ Primeira", key=f"{chave}_primeira", disabled=numero_pagina == 1):
+        estado['cursores'] = [None]
+        st.rerun()
+    if col_anterior.button("⬅️ Anterior", key=f"{chave}_anterior", disabled=numero_pagina == 1):
+        estado['cursores'].pop()
+        st.rerun()
+    if col_proxima.button("Próxima ➡️", key=f"{chave}_proxima", disabled=proximo_cursor is None):
+        estado['cursores'].append(proximo_cursor)
+        st.rerun()
+
+    return pagina
+
+def botao_exportar_historico(tabela, empresa_id, chave, rotulo, nome_arquivo):
+    """Exporta o histórico completo (com os filtros da tela) em CSV, gerado pelo COPY do PostgreSQL."""
+    filtros = st.session_state.get(f"{chave}_paginacao", {}).get('filtros') or {}
+    if st.button(f"📦 Preparar {rotulo}", key=f"{chave}_exportar"):
+        # O CSV vai para um arquivo temporário em disco à medida que o banco o envia. O download_button
+        # do Streamlit guarda o arquivo inteiro em memória para servi-lo, então só é oferecido até o limite.
+        with tempfile.TemporaryFile() as arquivo:
+            try:
+                with st.spinner("Exportando histórico..."):
+                    with engine.connect() as conn:
+                        exportar_historico_csv(conn, tabela, empresa_id, arquivo, **filtros)
+            except Exception as e:
+                st.error(f"Erro ao exportar o histórico de '{tabela}': {e}")
+                return
+
+            tamanho_mb = arquivo.tell() / (1024 * 1024)
+            if tamanho_mb > config.HISTORICO_EXPORTACAO_MAX_MB:
+                st.warning(
+                    f"A exportação tem {tamanho_mb:.0f} MB, acima do limite de {config.HISTORICO_EXPORTACAO_MAX_MB} MB "
+                    "para download pelo navegador. Reduza o período ou filtre por origem e tente novamente."
+                )
+                return
+            arquivo.seek(0)
+            dados = arquivo.read()
+
+        st.download_button(
+            label=f"⬇️ Download {rotulo}",
+            data=dados,
+            file_name=nome_arquivo,
+            mime="text/csv",
+            key=f"{chave}_download"
+        )
 
-def calcular_credito(row):
-    """Aplica regras de negócio para definir a conta de crédito."""
-    tipo = str(row.get('tipo', '')).strip().upper()
-    payee = str(row.get('payee', ''))
-    memo = str(row.get('memo', ''))
+# --- Funções de Regras de Negócio para Conciliação ---
 
-    if tipo == 'CREDIT':
-        if "CR COMPRAS" in memo:
-            return "15254"
-        if re.search(r'\*\*\*\.\d{3}\.\d{3}-\*\*', payee):
-            return "10550"
-        if re.search(r'\d{2}\.\d{3}\.\d{3} \d{4}-\d{2}', payee):
-            return "13709"
-    return ''
-
-def calcular_debito(row):
-    """Aplica regras de negócio para definir a conta de débito."""
-    tipo = str(row.get('tipo', '')).strip().upper()
-    memo = str(row.get('memo', '')).strip().upper()
-    payee = str(row.get('payee', '')).strip().upper()
-
-    if tipo == 'DEBIT':
-        if 'TARIFA COBRANÇA' in memo:
-            return "52877"
-        if 'TARIFA ENVIO PIX' in memo:
-            return "52878"
-        if 'DÉBITO PACOTE SERVIÇOS' in memo:
-            return "52914"
-        if 'DEB.PARCELAS SUBSC./INTEGR.' in memo:
-            return "84618"
-        if 'UNIMED' in payee:
-            return "23921"
-        if 'CÉDULA DE PRESENÇA' in payee:
-            return "26186"
-        if 'SALARIO' in memo:
-            return "20817"
-        if 'AGUA E ESGOTO' in memo:
-            return "52197"
-    return ''
-
-def calcular_historico(row):
-    """Aplica regras de negócio para definir o código do histórico."""
-    tipo = str(row.get('tipo', '')).strip().upper()
-    memo = str(row.get('memo', '')).strip().upper()
-    # Duas versões do payee: uma para regex (case-sensitive) e outra para busca de texto (case-insensitive)
-    payee_raw = str(row.get('payee', ''))
-    payee_upper = payee_raw.strip().upper()
+@st.cache_data(ttl=300) # Cache por 5 minutos
+def carregar_regras_lancamento(empresa_id):
+    """Carrega a tabela de regras de lançamento da empresa somada às regras padrão.
 
-    if tipo == 'CREDIT':
-        if 'CR COMPRAS' in memo:
-            return "601"
-        if 'TARIFA ENVIO PIX' in memo: # Regra do usuário para CREDIT
-            return "150"
-        if re.search(r'\\*\\*\\*\\.\\d{3}\\.\\d{3}-\\*\\*', payee_raw):
-            return "78"
-        if re.search(r'\\d{2}\\.\\d{3}\\.\\d{3} \\d{4}-\\d{2}', payee_raw):
-            return "78"
-            
-    elif tipo == 'DEBIT':
-        if 'TARIFA COBRANÇA' in memo:
-            return "8"
-        if 'TARIFA ENVIO PIX' in memo:
-            return "150"
-        if 'DÉBITO PACOTE SERVIÇOS' in memo:
-            return "111"
-        if 'DEB.PARCELAS SUBSC./INTEGR.' in memo:
-            return "37"
-        if 'UNIMED' in payee_upper:
-            return "88"
-        if 'CÉDULA DE PRESENÇA' in payee_upper:
-            return "58"
-        # Regras que antes eram 'OTHER' agora são tratadas como 'DEBIT'
-        if 'SALARIO' in memo:
-            return "88"
-        if 'AGUA E ESGOTO' in memo:
-            return "88"
-
-    return ''
+    As regras da empresa vêm da tabela concilia.regras_lancamento e são ordenadas junto
+    com as padrão pela prioridade (em caso de empate, a regra da empresa vence).
+    """
+    regras_empresa = []
+    if empresa_id:
+        try:
+            with engine.connect() as conn:
+                query = text("""
+                    SELECT prioridade, tipo, campo, padrao, regex, maiusculas, debito, credito, historico
+                    FROM concilia.regras_lancamento
+                    WHERE empresa_id = :empresa_id AND ativo
+                """)
+                result = conn.execute(query, {"empresa_id": empresa_id})
+                regras_empresa = [dict(row._mapping) for row in result]
+        except Exception as e:
+            # Se a tabela não existir, usa apenas as regras padrão.
+            if "does not exist" not in str(e):
+                st.warning(f"Não foi possível carregar as regras de lançamento da empresa. Detalhes: {e}")
+    return regras_empresa + REGRAS_LANCAMENTO_PADRAO
 
 def criar_complemento_com_prefixo(row):
     """Cria o campo complemento com prefixo (C/D/O) e une memo/payee."""
@@ -568,72 +629,35 @@ def criar_complemento_com_prefixo(row):
     
     return prefixo + complemento_base
 
-# --- Nova Função de Classificação de Sacado ---
-def classificar_sacado(sacado):
-    """Usa spaCy e heurísticas para classificar um nome como Pessoa Física (PF) ou Jurídica (PJ)."""
-    if not nlp or not sacado:
-        return 'Indefinido'
-    
-    # Heurística 1: Verifica siglas de empresa
-    if any(suffix in sacado.upper() for suffix in COMPANY_SUFFIXES):
-        return 'PJ'
-
-    # Análise com spaCy
-    doc = nlp(sacado)
-    for ent in doc.ents:
-        if ent.label_ == 'ORG': # Organização
-            return 'PJ'
-        if ent.label_ == 'PER': # Pessoa
-            return 'PF'
-            
-    # Heurística 2: Se não achou entidade, verifica se tem poucas palavras (provável PF)
-    if len(sacado.split()) <= 4:
-        return 'PF'
-    
-    return 'Indefinido' # Fallback
-
-def classificar_sacado_batch(conn, sacados_unicos):
-    """Classifica um batch de sacados usando o BD, heurísticas e spaCy como fallback."""
-    classificacoes = get_classificacoes_conhecidas(conn, sacados_unicos)
-    sacados_novos = [s for s in sacados_unicos if s not in classificacoes and pd.notna(s)]
-    
-    if nlp and sacados_novos:
-        for sacado_str in sacados_novos:
-            if not sacado_str or not isinstance(sacado_str, str):
-                continue
-
-            sacado_upper = sacado_str.upper()
-            
-            # Regra 1: Palavras-chave de alta confiança para PJ
-            if any(suffix in sacado_upper for suffix in COMPANY_SUFFIXES):
-                classificacoes[sacado_str] = 'PJ'
-                continue
-            
-            doc = nlp(sacado_str)
-            
-            # Regra 2: Entidades nomeadas de alta confiança
-            is_per = any(ent.label_ == 'PER' for ent in doc.ents)
-            is_org = any(ent.label_ == 'ORG' for ent in doc.ents)
-            
-            if is_per and not is_org:  # Se for apenas pessoa, é PF
-                classificacoes[sacado_str] = 'PF'
-                continue
-            
-            if is_org and not is_per:  # Se for apenas organização, é PJ
-                classificacoes[sacado_str] = 'PJ'
-                continue
-
-            # Regra 3: Heurísticas para casos ambíguos
-            # Nomes totalmente em maiúsculas (exceto nomes simples/curtos) são provavelmente PJ
-            if sacado_str.isupper() and len(sacado_str.split()) > 1:
-                classificacoes[sacado_str] = 'PJ'
-                continue
-
-            # Fallback final: Na dúvida, assume PJ, que é mais comum em transações de boleto.
-            # Isso corrige casos como 'DOHLER' que não são pegos pelas outras regras.
-            classificacoes[sacado_str] = 'PJ'
-            
-    return classificacoes
+# --- Classificação de Sacado ---
+def classificar_sacados(sacados):
+    """Classifica a coluna de sacados (PF/PJ), usando o cache do banco e o spaCy em lote para os novos."""
+    nlp = carregar_modelo_spacy()
+    if not nlp:
+        return pd.Series('Indefinido', index=sacados.index, dtype=object)
+    try:
+        with engine.begin() as conn:
+            return classificar_serie(conn, sacados, nlp, batch_size=config.SPACY_BATCH_SIZE)
+    except Exception as e:
+        st.warning(f"Cache de classificação de sacados indisponível, classificando sem o banco: {e}")
+        return classificar_serie(None, sacados, nlp, batch_size=config.SPACY_BATCH_SIZE)
+
+# --- Edição da Conciliação ---
+def marcar_conciliacao_alterada():
+    """Incrementa a versão da conciliação (invalida o CSV memorizado); chamar a cada alteração de dados."""
+    st.session_state['versao_conciliacao'] = st.session_state.get('versao_conciliacao', 0) + 1
+
+def desfazer_ultima_alteracao():
+    """Reverte a última alteração registrada na conciliação (callback do botão Desfazer)."""
+    df = st.session_state.get('df_conciliacao')
+    indice = desfazer_ultima(df, st.session_state.get('log_alteracoes_conciliacao', [])) if df is not None else None
+    if indice is not None:
+        marcar_conciliacao_alterada()
+        # Descarta o delta guardado no editor para que a edição desfeita não seja reaplicada
+        st.session_state.pop('data_editor', None)
+        indice_busca = st.session_state.get('indice_busca_conciliacao')
+        if indice_busca is not None:
+            indice_busca.atualizar([indice])
 
 # --- Interface da Sidebar ---
 with st.sidebar:
@@ -688,6 +712,22 @@ with st.sidebar:
             st.session_state.modo_sidebar = 'selecionar'
             st.rerun()
 
+    # --- Estatísticas do pool de conexões ---
+    with st.expander("📊 Pool de conexões"):
+        estatisticas_pool = engine.pool.estatisticas()
+        col_pool1, col_pool2 = st.columns(2)
+        col_pool1.metric("Em uso", f"{estatisticas_pool['em_uso']}/{estatisticas_pool['tamanho'] + estatisticas_pool['max_overflow']}")
+        col_pool2.metric("Livres", estatisticas_pool['livres'])
+        col_pool1.metric("Espera média", f"{estatisticas_pool['espera_media_ms']:.1f} ms")
+        col_pool2.metric("Espera p95", f"{estatisticas_pool['espera_p95_ms']:.1f} ms")
+        st.caption(
+            f"Overflow: {estatisticas_pool['overflow']}/{estatisticas_pool['max_overflow']} · "
+            f"Espera máx.: {estatisticas_pool['espera_max_ms']:.1f} ms · "
+            f"Checkouts: {estatisticas_pool['checkouts']} · Timeouts: {estatisticas_pool['timeouts']} · "
+            f"Conexões abertas: {estatisticas_pool['conexoes_novas']} "
+            f"(média {estatisticas_pool['conexao_media_ms']:.1f} ms, máx. {estatisticas_pool['conexao_max_ms']:.1f} ms)"
+        )
+
 
 # Configuração da página
 st.set_page_config(
@@ -746,123 +786,26 @@ with tab_processamento:
 
     st.markdown("---")
 
-    # Função para processar OFX com cache para performance
-    @st.cache_data
-    def processar_ofx(arquivo_ofx):
-        """Converte arquivo OFX em DataFrame"""
-        try:
-            ofx = OfxParser.parse(arquivo_ofx)
-            transacoes = []
-            
-            for conta in ofx.accounts:
-                for transacao in conta.statement.transactions:
-                    # LÓGICA ATUALIZADA: Define o tipo com base no sinal do valor (TRNAMT)
-                    tipo_transacao = 'DEBIT' if transacao.amount < 0 else 'CREDIT'
-
-                    transacoes.append({
-                        'data': transacao.date,
-                        'valor': transacao.amount,
-                        'tipo': tipo_transacao, # Usa o novo tipo definido
-                        'id': transacao.id,
-                        'memo': transacao.memo,
-                        'payee': transacao.payee,
-                        'checknum': transacao.checknum,
-                    })
-            
-            return pd.DataFrame(transacoes)
-        except Exception as e:
-            st.error(f"Erro ao processar OFX: {e}")
-            return None
-
-    # Função para processar Francesinhas XLS com cache para performance
-    @st.cache_data
+    # Função para processar Francesinhas XLS com cache em disco (chave = conteúdo do arquivo)
     def processar_francesinha_xls(arquivo_xls):
         """Extrai dados financeiros do Excel e retorna DataFrame limpo"""
         try:
-            # Ler Excel sem cabeçalho
-            df_raw = pd.read_excel(arquivo_xls, header=None)
-            
-            # Mapeamento de colunas
-            colunas_mapeamento = {
-                1: 'Sacado',
-                5: 'Nosso_Numero', 
-                11: 'Seu_Numero',
-                13: 'Dt_Previsao_Credito',
-                18: 'Vencimento',
-                21: 'Dt_Limite_Pgto', 
-                25: 'Valor_RS',
-                28: 'Vlr_Mora',
-                29: 'Vlr_Desc',
-                31: 'Vlr_Outros_Acresc',
-                34: 'Dt_Liquid',
-                35: 'Vlr_Cobrado'
-            }
-            
-            dados_limpos = []
-            
-            # Processar cada linha
-            for idx, row in df_raw.iterrows():
-                sacado = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ''
-                nosso_numero = str(row.iloc[5]).strip() if pd.notna(row.iloc[5]) else ''
-                
-                # Validar se é linha de dados válida
-                eh_linha_valida = (
-                    sacado != '' and
-                    len(sacado) > 3 and
-                    not sacado.startswith('Sacado') and
-                    nosso_numero != '' and
-                    not bool(re.match(r'^\d+-[A-Z]', sacado)) and
-                    not any(palavra in sacado.upper() for palavra in [
-                        'ORDENADO', 'TIPO CONSULTA', 'CONTA CORRENTE', 
-                        'CEDENTE', 'RELATÓRIO', 'TOTAL', 'DATA INICIAL'
-                    ])
-                )
-                
-                if eh_linha_valida:
-                    linha_dados = {}
-                    
-                    for col_idx, nome_col in colunas_mapeamento.items():
-                        valor = row.iloc[col_idx] if col_idx < len(row) else None
-                        
-                        if pd.notna(valor):
-                            if nome_col in ['Dt_Previsao_Credito', 'Vencimento', 'Dt_Limite_Pgto', 'Dt_Liquid']:
-                                if isinstance(valor, datetime):
-                                    linha_dados[nome_col] = valor.strftime('%d/%m/%Y')
-                                else:
-                                    linha_dados[nome_col] = str(valor)
-                            elif nome_col in ['Valor_RS', 'Vlr_Mora', 'Vlr_Desc', 'Vlr_Outros_Acresc', 'Vlr_Cobrado']:
-                                try:
-                                    linha_dados[nome_col] = float(valor)
-                                except:
-                                    linha_dados[nome_col] = 0.0
-                            else:
-                                linha_dados[nome_col] = str(valor).strip()
-                        else:
-                            linha_dados[nome_col] = ''
-                    
-                    dados_limpos.append(linha_dados)
-            
-            if dados_limpos:
-                df_final = pd.DataFrame(dados_limpos)
-                colunas_ordem = [
-                    'Sacado', 'Nosso_Numero', 'Seu_Numero', 'Dt_Previsao_Credito',
-                    'Vencimento', 'Dt_Limite_Pgto', 'Valor_RS', 'Vlr_Mora', 
-                    'Vlr_Desc', 'Vlr_Outros_Acresc', 'Dt_Liquid', 'Vlr_Cobrado'
-                ]
-                return df_final[colunas_ordem]
-            
-            return pd.DataFrame()
-            
+            conteudo = arquivo_xls.getvalue()
+            # Relatórios muito grandes são lidos linha a linha para limitar o uso de memória
+            streaming = len(conteudo) >= config.FRANCESINHA_STREAMING_MIN_MB * 1024 * 1024
+            return ler_com_cache(
+                conteudo, 'francesinha-streaming' if streaming else 'francesinha', VERSAO_PARSER_FRANCESINHA,
+                lambda dados: ler_francesinha(io.BytesIO(dados), streaming=streaming)
+            )
         except Exception as e:
             st.error(f"Erro ao processar Francesinha: {e}")
             return None
 
     # Função para converter DataFrame para CSV
-    def converter_para_csv(df):
-        """Converte DataFrame para CSV em bytes"""
-        output = io.StringIO()
-        df.to_csv(output, index=False, sep=';', encoding='utf-8-sig')
-        return output.getvalue().encode('utf-8-sig')
+    def converter_para_csv(df, chave, colunas=None, versao=None):
+        """Converte DataFrame para CSV em bytes, reaproveitando o resultado enquanto os dados não mudarem"""
+        cache = st.session_state.setdefault('cache_csv', {})
+        return csv_memorizado(cache, chave, df, colunas=colunas, versao=versao)
 
     # Interface do Streamlit
     col1, col2 = st.columns(2)
@@ -881,12 +824,26 @@ with tab_processamento:
             
             if st.button("Processar OFX", type="primary"):
                 dados_extratos = []
-                with st.spinner("Processando arquivos OFX..."):
-                    for arquivo in arquivos_ofx:
-                        df_extrato = processar_ofx(arquivo)
-                        if df_extrato is not None:
-                            df_extrato['arquivo_origem'] = arquivo.name
-                            dados_extratos.append(df_extrato)
+                barra_progresso = st.progress(0.0, text="Processando arquivos OFX...")
+
+                def atualizar_progresso(concluidos, total, resultado):
+                    barra_progresso.progress(concluidos / total, text=f"Processando arquivos OFX... {concluidos}/{total} ({resultado['nome']})")
+
+                # Os arquivos são lidos em paralelo, mas os resultados voltam na ordem do upload
+                resultados = processar_ofx_paralelo(
+                    [(arquivo.name, arquivo.getvalue()) for arquivo in arquivos_ofx],
+                    max_workers=config.OFX_MAX_WORKERS,
+                    ao_concluir=atualizar_progresso,
+                )
+                barra_progresso.empty()
+
+                for resultado in resultados:
+                    if resultado['erro']:
+                        st.error(f"Erro ao processar OFX '{resultado['nome']}': {resultado['erro']}")
+                        continue
+                    df_extrato = resultado['df']
+                    df_extrato['arquivo_origem'] = resultado['nome']
+                    dados_extratos.append(df_extrato)
                 
                 if dados_extratos:
                     # Salva o DataFrame consolidado no session_state
@@ -916,7 +873,7 @@ with tab_processamento:
             # --- Botões de Ação para OFX ---
             col_down_ofx, col_save_ofx = st.columns(2)
             with col_down_ofx:
-                csv_extratos = converter_para_csv(df_extratos_final)
+                csv_extratos = converter_para_csv(df_extratos_final, 'extratos')
                 st.download_button(
                     label="⬇️ Download CSV (Todos os Arquivos)",
                     data=csv_extratos,
@@ -983,30 +940,14 @@ with tab_processamento:
                         (df_francesinhas_final['Dt_Previsao_Credito'].notna())
                     ].copy()
                     
-                    # Lógica para criar linhas de juros de mora
-                    linhas_mora = []
-                    df_sem_mora = df_francesinhas_final.copy() # Salva o estado antes de adicionar mora
-
-                    for idx, row in df_sem_mora.iterrows():
-                        vlr_mora = float(row['Vlr_Mora']) if pd.notna(row['Vlr_Mora']) and row['Vlr_Mora'] != '' else 0
-                        
-                        if vlr_mora > 0:
-                            nova_linha = row.copy()
-                            nova_linha['Valor_RS'] = vlr_mora
-                            nova_linha['Vlr_Cobrado'] = vlr_mora
-                            nova_linha['Vlr_Mora'] = 0
-                            nova_linha['Vlr_Desc'] = 0
-                            nova_linha['Vlr_Outros_Acresc'] = 0
-                            nova_linha['Arquivo_Origem'] = "Juros de Mora"
-                            linhas_mora.append(nova_linha)
-                    
-                    if linhas_mora:
-                        df_mora = pd.DataFrame(linhas_mora)
-                        df_francesinhas_final = pd.concat([df_sem_mora, df_mora], ignore_index=True)
+                    # Linhas de juros de mora: uma por boleto com Vlr_Mora > 0, acrescentadas ao final
+                    df_francesinhas_final, linhas_mora_count = adicionar_linhas_derivadas(
+                        df_francesinhas_final, LINHAS_DERIVADAS
+                    )
                     
                     # Salva o resultado no session_state
                     st.session_state['df_francesinhas_final'] = df_francesinhas_final
-                    st.session_state['linhas_mora_count'] = len(linhas_mora)
+                    st.session_state['linhas_mora_count'] = linhas_mora_count
 
                 elif 'df_francesinhas_final' in st.session_state:
                     del st.session_state['df_francesinhas_final']
@@ -1026,7 +967,7 @@ with tab_processamento:
                 col_down_fran, col_save_fran = st.columns(2)
                 
                 with col_down_fran:
-                    csv_francesinhas = converter_para_csv(df_francesinhas_final)
+                    csv_francesinhas = converter_para_csv(df_francesinhas_final, 'francesinhas')
                     st.download_button(
                         label="⬇️ Download Francesinha Completa",
                         data=csv_francesinhas,
@@ -1078,9 +1019,12 @@ with tab_processamento:
             # 2. Filtra o OFX para remover as liquidações que serão substituídas
             df_ofx_processado = df_extratos[df_extratos['memo'] != 'CRÉD.LIQUIDAÇÃO COBRANÇA'].copy()
             conciliacao_ofx = pd.DataFrame()
-            conciliacao_ofx['débito'] = df_ofx_processado.apply(calcular_debito, axis=1)
-            conciliacao_ofx['crédito'] = df_ofx_processado.apply(calcular_credito, axis=1)
-            conciliacao_ofx['histórico'] = df_ofx_processado.apply(calcular_historico, axis=1)
+            # Débito, crédito e histórico saem da tabela de regras em uma única passada
+            regras_lancamento = compilar_regras(carregar_regras_lancamento(st.session_state.get('empresa_ativa', {}).get('id')))
+            lancamentos = aplicar_regras_lancamento(df_ofx_processado, regras_lancamento)
+            conciliacao_ofx['débito'] = lancamentos['debito']
+            conciliacao_ofx['crédito'] = lancamentos['credito']
+            conciliacao_ofx['histórico'] = lancamentos['historico']
             conciliacao_ofx['data'] = pd.to_datetime(df_ofx_processado['data']).dt.strftime('%d/%m/%Y')
             conciliacao_ofx['valor'] = df_ofx_processado['valor'].abs().apply(lambda x: f"{x:.2f}".replace('.', ','))
             conciliacao_ofx['complemento'] = df_ofx_processado.apply(criar_complemento_com_prefixo, axis=1)
@@ -1090,7 +1034,7 @@ with tab_processamento:
             conciliacao_francesinha = pd.DataFrame()
             if not df_francesinhas.empty:
                 # Classifica o Sacado
-                df_francesinhas['tipo_sacado'] = df_francesinhas['Sacado'].apply(classificar_sacado)
+                df_francesinhas['tipo_sacado'] = classificar_sacados(df_francesinhas['Sacado'])
 
                 # Mapeia o valor da liquidação do OFX para a francesinha pela data
                 df_francesinhas['data_liquid_dt'] = pd.to_datetime(df_francesinhas['Dt_Liquid'], format='%d/%m/%Y', errors='coerce')
@@ -1137,30 +1081,16 @@ with tab_processamento:
             empresa_id = st.session_state.get('empresa_ativa', {}).get('id')
             if empresa_id:
                 regras_salvas = carregar_regras_conciliacao(empresa_id)
-                if regras_salvas:
-                    df_conciliacao['chave_regra'] = df_conciliacao.apply(criar_chave_regra, axis=1)
-                    df_conciliacao['complemento_hash'] = df_conciliacao['chave_regra'].apply(gerar_hash)
-
-                    linhas_afetadas = 0
-                    for index, row in df_conciliacao.iterrows():
-                        if pd.notna(row['complemento_hash']):
-                            regra = regras_salvas.get(row['complemento_hash'])
-                            if regra:
-                                # A regra salva tem prioridade e sobrescreve os valores
-                                if regra.get('debito'):
-                                    df_conciliacao.at[index, 'débito'] = regra['debito']
-                                if regra.get('credito'):
-                                    df_conciliacao.at[index, 'crédito'] = regra['credito']
-                                if regra.get('historico'):
-                                    df_conciliacao.at[index, 'histórico'] = regra['historico']
-                                linhas_afetadas += 1
-                    
-                    df_conciliacao.drop(columns=['chave_regra', 'complemento_hash'], inplace=True)
+                if not regras_salvas.empty:
+                    # A regra salva tem prioridade e sobrescreve os valores (junção pelo hash da chave)
+                    df_conciliacao, linhas_afetadas = aplicar_regras_salvas(df_conciliacao, regras_salvas)
                     if linhas_afetadas > 0:
                         st.toast(f"🤖 {linhas_afetadas} regras salvas foram aplicadas automaticamente.")
 
-            # Armazenar resultado na sessão
+            # Armazenar resultado na sessão (um novo dataset começa com o log de alterações vazio)
             st.session_state['df_conciliacao'] = df_conciliacao
+            st.session_state['log_alteracoes_conciliacao'] = []
+            marcar_conciliacao_alterada()
             st.success("✅ Dataset de conciliação gerado!")
 
     elif 'df_francesinhas_final' in st.session_state and 'df_extratos_final' not in st.session_state:
@@ -1178,9 +1108,13 @@ with tab_processamento:
             filtro_universal = st.text_input("🔍 Filtrar em todas as colunas:", help="Digite para filtrar a tabela em tempo real.")
         
         df_original = st.session_state['df_conciliacao']
+        # Índice de busca montado uma vez por dataset de conciliação e atualizado a cada edição
+        indice_busca = st.session_state.get('indice_busca_conciliacao')
+        if indice_busca is None or not indice_busca.pertence_a(df_original):
+            indice_busca = IndiceBusca(df_original, colunas_ignoradas=('selecionar',))
+            st.session_state['indice_busca_conciliacao'] = indice_busca
         if filtro_universal:
-            df_str = df_original.astype(str).apply(lambda s: s.str.lower())
-            indices_filtrados = df_str[df_str.apply(lambda row: row.str.contains(filtro_universal.lower(), na=False).any(), axis=1)].index
+            indices_filtrados = indice_busca.filtrar(filtro_universal)
         else:
             indices_filtrados = df_original.index
 
@@ -1236,14 +1170,19 @@ with tab_processamento:
                     condicao_francesinha = df_atual['origem'].str.contains('francesinha', case=False, na=False)
                     condicao_pj = df_atual['sacado_temp'].isin(nomes_clientes_pj_limitados)
                     
+                    log_alteracoes = st.session_state.setdefault('log_alteracoes_conciliacao', [])
                     indices_pj = df_atual[condicao_francesinha & condicao_pj].index
+                    registrar_alteracoes(df_atual, indices_pj, ['crédito', 'histórico'], ['13709', '78'], log_alteracoes)
                     df_atual.loc[indices_pj, 'crédito'] = '13709'
                     df_atual.loc[indices_pj, 'histórico'] = '78'
                     indices_outros = df_atual[condicao_francesinha & ~condicao_pj].index
+                    registrar_alteracoes(df_atual, indices_outros, ['crédito', 'histórico'], ['10550', '78'], log_alteracoes)
                     df_atual.loc[indices_outros, 'crédito'] = '10550'
                     df_atual.loc[indices_outros, 'histórico'] = '78'
                     df_atual.drop(columns=['sacado_temp'], inplace=True)
                     st.session_state['df_conciliacao'] = df_atual
+                    marcar_conciliacao_alterada()
+                    indice_busca.atualizar(indices_pj.union(indices_outros))
                     st.success("✅ Classificação da francesinha aplicada com sucesso!")
 
         # Editor de dados
@@ -1252,7 +1191,7 @@ with tab_processamento:
         # Prepara o DF para o editor, mostrando apenas os filtrados
         df_para_mostrar = df_original.loc[indices_filtrados]
         
-        edited_df = st.data_editor(
+        st.data_editor(
             df_para_mostrar,
             key='data_editor',
             use_container_width=True,
@@ -1269,9 +1208,24 @@ with tab_processamento:
             },
         )
 
-        # Atualiza o DataFrame na sessão com as edições feitas pelo usuário
-        if 'df_conciliacao' in st.session_state:
-            st.session_state['df_conciliacao'].update(edited_df)
+        # Aplica ao DataFrame da sessão apenas as células alteradas no editor (delta do data_editor)
+        log_alteracoes = st.session_state.setdefault('log_alteracoes_conciliacao', [])
+        linhas_editadas = st.session_state.get('data_editor', {}).get('edited_rows', {})
+        if linhas_editadas:
+            indices_alterados = aplicar_edicoes(
+                st.session_state['df_conciliacao'], df_para_mostrar.index, linhas_editadas, log_alteracoes
+            )
+            if indices_alterados:
+                marcar_conciliacao_alterada()
+            # Só as linhas alteradas são recalculadas no índice de busca
+            indice_busca.atualizar(indices_alterados)
+
+        if log_alteracoes:
+            col_log, col_desfazer = st.columns([3, 1])
+            with col_log:
+                st.caption(f"✏️ {len(log_alteracoes)} alteração(ões) em {len(linhas_alteradas(log_alteracoes))} linha(s) nesta sessão.")
+            with col_desfazer:
+                st.button("↩️ Desfazer última alteração", on_click=desfazer_ultima_alteracao, use_container_width=True)
 
         # --- Lógica de Edição em Lote ---
         st.markdown("---")
@@ -1306,12 +1260,21 @@ with tab_processamento:
                 with col_btn1:
                     if st.button("Aplicar aos Selecionados", type="primary", use_container_width=True):
                         indices_para_atualizar = linhas_selecionadas.index
+                        campos_em_lote = {'débito': novo_debito, 'crédito': novo_credito, 'histórico': novo_historico}
+                        campos_em_lote = {coluna: valor for coluna, valor in campos_em_lote.items() if valor}
+                        registrar_alteracoes(
+                            st.session_state['df_conciliacao'], indices_para_atualizar,
+                            list(campos_em_lote), list(campos_em_lote.values()),
+                            st.session_state.setdefault('log_alteracoes_conciliacao', [])
+                        )
                         if novo_debito:
                             st.session_state['df_conciliacao'].loc[indices_para_atualizar, 'débito'] = novo_debito
                         if novo_credito:
                             st.session_state['df_conciliacao'].loc[indices_para_atualizar, 'crédito'] = novo_credito
                         if novo_historico:
                             st.session_state['df_conciliacao'].loc[indices_para_atualizar, 'histórico'] = novo_historico
+                        marcar_conciliacao_alterada()
+                        indice_busca.atualizar(indices_para_atualizar)
                         st.session_state['df_conciliacao']['selecionar'] = False
                         st.session_state.editing_enabled = False
                         st.toast("Valores aplicados com sucesso!")
@@ -1324,9 +1287,13 @@ with tab_processamento:
         
         col_down, col_save = st.columns(2)
         with col_down:
-            # Prepara o DF para download CSV, removendo a coluna 'origem'
-            df_para_csv = df_para_salvar.drop(columns=['origem'], errors='ignore')
-            csv_conciliacao = converter_para_csv(df_para_csv)
+            # CSV sem as colunas 'selecionar' e 'origem'; com a versão explícita, o subconjunto
+            # só é copiado (e o CSV gerado) quando a conciliação mudou desde o último rerun
+            colunas_csv = [c for c in st.session_state['df_conciliacao'].columns if c not in ('selecionar', 'origem')]
+            csv_conciliacao = converter_para_csv(
+                st.session_state['df_conciliacao'], 'conciliacao', colunas=colunas_csv,
+                versao=st.session_state.get('versao_conciliacao', 0),
+            )
             st.download_button(
                 label="⬇️ Download CSV de Conciliação",
                 data=csv_conciliacao,
@@ -1370,35 +1337,19 @@ with tab_historico:
 
         # Histórico de Transações OFX
         with st.expander("Histórico de Transações (OFX)", expanded=True):
-            df_hist_transacoes = carregar_dados_historicos(empresa_id, "transacoes")
-            if not df_hist_transacoes.empty:
-                st.dataframe(df_hist_transacoes, use_container_width=True)
-                csv_hist_transacoes = converter_para_csv(df_hist_transacoes)
-                st.download_button(
-                    label="⬇️ Download Histórico de Transações",
-                    data=csv_hist_transacoes,
-                    file_name=f"historico_transacoes_{st.session_state['empresa_ativa']['nome']}.csv",
-                    mime="text/csv",
-                    key='download_hist_transacoes'
+            if exibir_historico_paginado("transacoes_ofx", empresa_id, "hist_transacoes") is not None:
+                botao_exportar_historico(
+                    "transacoes_ofx", empresa_id, "hist_transacoes", "Histórico de Transações",
+                    f"historico_transacoes_{st.session_state['empresa_ativa']['nome']}.csv"
                 )
-            else:
-                st.write("Nenhuma transação encontrada no histórico.")
 
         # Histórico de Conciliações Salvas
         with st.expander("Histórico de Conciliações Salvas", expanded=True):
-            df_hist_conciliacoes = carregar_dados_historicos(empresa_id, "lancamentos_conciliacao")
-            if not df_hist_conciliacoes.empty:
-                st.dataframe(df_hist_conciliacoes, use_container_width=True)
-                csv_hist_conciliacoes = converter_para_csv(df_hist_conciliacoes)
-                st.download_button(
-                    label="⬇️ Download Histórico de Conciliações",
-                    data=csv_hist_conciliacoes,
-                    file_name=f"historico_conciliacoes_{st.session_state['empresa_ativa']['nome']}.csv",
-                    mime="text/csv",
-                    key='download_hist_conciliacoes'
+            if exibir_historico_paginado("lancamentos_conciliacao", empresa_id, "hist_conciliacoes") is not None:
+                botao_exportar_historico(
+                    "lancamentos_conciliacao", empresa_id, "hist_conciliacoes", "Histórico de Conciliações",
+                    f"historico_conciliacoes_{st.session_state['empresa_ativa']['nome']}.csv"
                 )
-            else:
-                st.write("Nenhuma conciliação encontrada no histórico.")
 
     else:
         st.warning("Selecione uma empresa para ver o histórico.")
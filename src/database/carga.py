@@ -0,0 +1,171 @@
+"""
+Gravação em massa de DataFrames no PostgreSQL.
+
+Usa COPY ... FROM STDIN (psycopg2 copy_expert) na conexão da transação em andamento,
+o que evita um INSERT por linha do to_sql padrão. Quando o driver não oferece COPY,
+cai para INSERTs de várias linhas por comando.
+"""
+
+import io
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Marcador de nulo no CSV enviado ao COPY (distingue NULL de texto vazio)
+MARCADOR_NULO = r'\N'
+LINHAS_POR_LOTE = 50000
+
+
+def _preparar(df):
+    """Ajusta tipos que o COPY não aceitaria como o to_sql (ex.: inteiros que viraram float por causa de NaN)."""
+    df = df.copy()
+    for coluna in df.columns:
+        serie = df[coluna]
+        if pd.api.types.is_float_dtype(serie):
+            valores = serie.dropna()
+            # Só converte o que cabe em int64 (valores maiores seguem como float, sem erro na conversão)
+            if (not valores.empty and np.isfinite(valores).all() and (valores.abs() < 2.0 ** 63).all()
+                    and (valores == np.floor(valores)).all()):
+                df[coluna] = serie.astype('Int64')
+    return df
+
+
+def _nome_qualificado(conn, tabela, schema=None):
+    quote = conn.dialect.identifier_preparer.quote
+    return f"{quote(schema)}.{quote(tabela)}" if schema else quote(tabela)
+
+
+def _copiar(conn, df, tabela, schema=None):
+    """Envia o DataFrame via COPY em lotes. Retorna False se a conexão não suportar COPY."""
+    dbapi_conn = conn.connection.dbapi_connection
+    cursor = dbapi_conn.cursor()
+    if not hasattr(cursor, 'copy_expert'):
+        cursor.close()
+        return False
+
+    quote = conn.dialect.identifier_preparer.quote
+    colunas = ', '.join(quote(str(c)) for c in df.columns)
+    comando = (
+        f"COPY {_nome_qualificado(conn, tabela, schema)} ({colunas}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{MARCADOR_NULO}')"
+    )
+    try:
+        for inicio in range(0, len(df), LINHAS_POR_LOTE):
+            buffer = io.StringIO()
+            df.iloc[inicio:inicio + LINHAS_POR_LOTE].to_csv(
+                buffer, index=False, header=False, na_rep=MARCADOR_NULO, date_format='%Y-%m-%d %H:%M:%S.%f'
+            )
+            buffer.seek(0)
+            cursor.copy_expert(comando, buffer)
+    finally:
+        cursor.close()
+    return True
+
+
+def inserir_em_massa(conn, df, tabela, schema=None):
+    """Insere o DataFrame na tabela dentro da transação de `conn` (Connection do SQLAlchemy).
+
+    As colunas do DataFrame devem existir na tabela. Retorna o número de linhas gravadas.
+    """
+    if df.empty:
+        return 0
+
+    inicio = time.perf_counter()
+    df_copia = _preparar(df)
+    if _copiar(conn, df_copia, tabela, schema):
+        metodo = 'COPY'
+    else:
+        df.to_sql(tabela, conn, schema=schema, if_exists='append', index=False, method='multi', chunksize=1000)
+        metodo = 'INSERT multi-linha'
+
+    duracao = time.perf_counter() - inicio
+    logger.info("%d linhas gravadas em %s via %s em %.2fs (%.0f linhas/s)",
+                len(df), tabela, metodo, duracao, len(df) / duracao if duracao else float('inf'))
+    return len(df)
+
+
+def sincronizar_incremental(conn, df, tabela, filtro_sql, parametros, colunas_fixas=None):
+    """Atualiza o subconjunto de `tabela` definido por `filtro_sql` para que fique igual ao DataFrame.
+
+    Os dados novos vão para uma tabela temporária (via COPY) e cada linha recebe uma impressão
+    digital (md5 das colunas do DataFrame). Com SQL em conjunto, apenas as linhas que sumiram são
+    apagadas e apenas as novas são inseridas; o conteúdo das inalteradas não é regravado. Linhas
+    repetidas são comparadas pela quantidade de ocorrências. `colunas_fixas` ({coluna: valor}) não
+    entram na comparação e são gravadas em todas as linhas do subconjunto, novas e mantidas
+    (ex.: importacao_id: todas as linhas do arquivo passam a apontar para a importação atual,
+    como no modo que apaga e reinsere).
+
+    Retorna um dicionário com as quantidades de linhas inseridas, removidas e mantidas.
+    """
+    colunas_fixas = colunas_fixas or {}
+    quote = conn.dialect.identifier_preparer.quote
+    colunas = [c for c in df.columns if c not in colunas_fixas]
+    lista = ', '.join(quote(c) for c in colunas)
+
+    def impressao(alias):
+        return f"md5(ROW({', '.join(f'{alias}.{quote(c)}' for c in colunas)})::text)"
+
+    destino = quote(tabela)
+    staging = quote(f"staging_{tabela}")
+
+    inicio = time.perf_counter()
+    conn.execute(text(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {lista} FROM {destino} WITH NO DATA"))
+    inserir_em_massa(conn, df[colunas], f"staging_{tabela}")
+
+    # 1. Remove as ocorrências que não existem mais (por impressão digital e quantidade)
+    removidas = conn.execute(text(f"""
+        WITH atual AS (
+            SELECT t.ctid AS linha, {impressao('t')} AS impressao,
+                   row_number() OVER (PARTITION BY {impressao('t')}) AS ocorrencia
+            FROM {destino} t
+            WHERE {filtro_sql}
+        ), novo AS (
+            SELECT {impressao('s')} AS impressao, count(*) AS quantidade
+            FROM {staging} s
+            GROUP BY 1
+        )
+        DELETE FROM {destino} d
+        USING atual a LEFT JOIN novo n ON n.impressao = a.impressao
+        WHERE d.ctid = a.linha AND a.ocorrencia > COALESCE(n.quantidade, 0)
+    """), parametros).rowcount
+
+    fixas = list(colunas_fixas)
+    parametros_fixos = {f"fixa_{i}": valor for i, valor in enumerate(colunas_fixas.values())}
+
+    # 2. As linhas mantidas passam a ter os valores fixos (ex.: importacao_id da importação atual)
+    if fixas:
+        atribuicoes = ', '.join(f"{quote(c)} = :fixa_{i}" for i, c in enumerate(fixas))
+        diferentes = ' OR '.join(f"{quote(c)} IS DISTINCT FROM :fixa_{i}" for i, c in enumerate(fixas))
+        conn.execute(text(f"UPDATE {destino} SET {atribuicoes} WHERE ({filtro_sql}) AND ({diferentes})"),
+                     {**parametros, **parametros_fixos})
+
+    # 3. Insere apenas as ocorrências que ainda não existem
+    colunas_insert = ', '.join(quote(c) for c in colunas + fixas)
+    valores_insert = ', '.join([f"n.{quote(c)}" for c in colunas] + [f":fixa_{i}" for i in range(len(fixas))])
+    inseridas = conn.execute(text(f"""
+        WITH novo AS (
+            SELECT s.*, {impressao('s')} AS impressao_linha,
+                   row_number() OVER (PARTITION BY {impressao('s')}) AS ocorrencia
+            FROM {staging} s
+        ), atual AS (
+            SELECT {impressao('t')} AS impressao_linha, count(*) AS quantidade
+            FROM {destino} t
+            WHERE {filtro_sql}
+            GROUP BY 1
+        )
+        INSERT INTO {destino} ({colunas_insert})
+        SELECT {valores_insert}
+        FROM novo n LEFT JOIN atual a ON a.impressao_linha = n.impressao_linha
+        WHERE n.ocorrencia > COALESCE(a.quantidade, 0)
+    """), {**parametros, **parametros_fixos}).rowcount
+
+    conn.execute(text(f"DROP TABLE {staging}"))
+    duracao = time.perf_counter() - inicio
+    resultado = {'inseridas': inseridas, 'removidas': removidas, 'mantidas': len(df) - inseridas}
+    logger.info("Sincronização incremental de %s em %.2fs: %s", tabela, duracao, resultado)
+    return resultado
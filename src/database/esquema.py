@@ -0,0 +1,73 @@
+"""
+Registro (cache) do esquema das tabelas do banco, compartilhado por todo o processo.
+
+A reflexão do SQLAlchemy faz várias consultas ao catálogo do PostgreSQL; aqui ela é feita
+uma única vez para todas as tabelas usadas pelo app e reaproveitada até expirar o TTL ou
+até invalidar_esquema() ser chamada (ex.: após uma migração).
+"""
+
+import logging
+import threading
+import time
+
+import sqlalchemy
+
+logger = logging.getLogger(__name__)
+
+TABELAS_APP = (
+    'empresas', 'importacoes', 'transacoes_ofx', 'francesinhas', 'conciliacoes',
+    'lancamentos_conciliacao', 'regras_conciliacao', 'regras_lancamento', 'sacado_classificacao',
+)
+TTL_PADRAO = 3600
+
+_lock = threading.Lock()
+_registros = {}  # schema -> (momento da reflexão, MetaData)
+_acertos = {}  # schema -> acessos atendidos pelo cache desde a última reflexão
+
+
+def _refletir(conn, schema):
+    metadata = sqlalchemy.MetaData()
+    inicio = time.perf_counter()
+    metadata.reflect(bind=conn, schema=schema, only=lambda nome, _: nome in TABELAS_APP)
+    logger.info("Esquema '%s' refletido em %.2fs (%d tabelas; %d acessos atendidos pelo cache desde a reflexão anterior)",
+                schema or 'padrão', time.perf_counter() - inicio, len(metadata.tables), _acertos.pop(schema, 0))
+    return metadata
+
+
+def obter_tabela(conn, tabela, schema=None, ttl=TTL_PADRAO):
+    """Retorna o sqlalchemy.Table refletido, refletindo todas as tabelas do app na primeira chamada.
+
+    Tabelas fora de TABELAS_APP são refletidas individualmente e adicionadas ao mesmo registro.
+    """
+    chave = f"{schema}.{tabela}" if schema else tabela
+    with _lock:
+        registro = _registros.get(schema)
+        if registro is None or time.monotonic() - registro[0] > ttl:
+            registro = (time.monotonic(), _refletir(conn, schema))
+            _registros[schema] = registro
+        else:
+            _acertos[schema] = _acertos.get(schema, 0) + 1
+            logger.debug("Esquema '%s' servido do cache (%s)", schema or 'padrão', chave)
+        metadata = registro[1]
+        if chave not in metadata.tables:
+            sqlalchemy.Table(tabela, metadata, schema=schema, autoload_with=conn)
+        return metadata.tables[chave]
+
+
+def colunas_da_tabela(conn, tabela, schema=None, ttl=TTL_PADRAO):
+    """Nomes das colunas da tabela, na ordem do banco."""
+    return [coluna.name for coluna in obter_tabela(conn, tabela, schema, ttl).columns]
+
+
+def tipos_das_colunas(conn, tabela, schema=None, ttl=TTL_PADRAO):
+    """Dicionário {coluna: tipo SQLAlchemy} da tabela."""
+    return {coluna.name: coluna.type for coluna in obter_tabela(conn, tabela, schema, ttl).columns}
+
+
+def invalidar_esquema(schema=None, todos=False):
+    """Descarta o esquema em cache (de um schema ou de todos), forçando nova reflexão no próximo uso."""
+    with _lock:
+        if todos:
+            _registros.clear()
+        else:
+            _registros.pop(schema, None)
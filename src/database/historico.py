@@ -0,0 +1,113 @@
+"""
+Consulta paginada do histórico salvo (transações OFX, francesinhas e lançamentos de conciliação).
+
+Usa paginação por chave (keyset) em (created_at, id): cada página continua a partir da
+última linha da anterior, sem OFFSET, e o custo não cresce com o número da página.
+Depende dos índices (empresa_id, created_at DESC, id DESC) de database_optimizations.sql.
+"""
+
+import codecs
+import re
+
+import pandas as pd
+from sqlalchemy import text
+
+# Colunas usadas nos filtros de cada tabela do histórico
+TABELAS_HISTORICO = {
+    'transacoes_ofx': {'coluna_data': 'data', 'coluna_origem': 'arquivo_origem', 'colunas_conta': ()},
+    'francesinhas': {'coluna_data': 'dt_liquid', 'coluna_origem': 'arquivo_origem', 'colunas_conta': ()},
+    'lancamentos_conciliacao': {'coluna_data': 'data', 'coluna_origem': 'origem', 'colunas_conta': ('debito', 'credito')},
+}
+TAMANHO_PAGINA = 100
+# Tamanho dos blocos lidos do COPY na exportação
+BLOCO_EXPORTACAO = 1024 * 1024
+
+
+def _montar_filtros(tabela, empresa_id, data_inicio=None, data_fim=None, origem=None, conta=None):
+    """Cláusula WHERE e parâmetros dos filtros. Filtros None/vazios são ignorados."""
+    if tabela not in TABELAS_HISTORICO:
+        raise ValueError(f"Tabela de histórico desconhecida: {tabela}")
+    definicao = TABELAS_HISTORICO[tabela]
+    condicoes = ["empresa_id = :empresa_id"]
+    parametros = {"empresa_id": empresa_id}
+
+    if data_inicio:
+        condicoes.append(f"{definicao['coluna_data']} >= :data_inicio")
+        parametros["data_inicio"] = data_inicio
+    if data_fim:
+        # Inclui o dia final inteiro também em colunas TIMESTAMP
+        condicoes.append(f"{definicao['coluna_data']} < CAST(:data_fim AS date) + 1")
+        parametros["data_fim"] = data_fim
+    if origem:
+        condicoes.append(f"{definicao['coluna_origem']} = :origem")
+        parametros["origem"] = origem
+    if conta and definicao['colunas_conta']:
+        condicoes.append("(" + " OR ".join(f"{coluna} = :conta" for coluna in definicao['colunas_conta']) + ")")
+        parametros["conta"] = str(conta)
+
+    return " AND ".join(condicoes), parametros
+
+
+def buscar_pagina_historico(conn, tabela, empresa_id, cursor=None, limite=TAMANHO_PAGINA, **filtros):
+    """Busca uma página do histórico, da linha mais recente para a mais antiga.
+
+    `cursor` é o (created_at, id) da última linha da página anterior (None para a primeira).
+    Retorna o DataFrame da página e o cursor da próxima página (None se esta for a última).
+    """
+    where, parametros = _montar_filtros(tabela, empresa_id, **filtros)
+    if cursor is not None:
+        where += " AND (created_at, id) < (:cursor_created_at, :cursor_id)"
+        parametros["cursor_created_at"], parametros["cursor_id"] = cursor
+    parametros["limite"] = limite + 1  # Uma linha a mais indica se existe próxima página
+
+    query = text(f"SELECT * FROM {tabela} WHERE {where} ORDER BY created_at DESC, id DESC LIMIT :limite")
+    pagina = pd.read_sql(query, conn, params=parametros)
+
+    proximo_cursor = None
+    if len(pagina) > limite:
+        pagina = pagina.iloc[:limite]
+        ultima = pagina.iloc[-1]
+        proximo_cursor = (pd.Timestamp(ultima['created_at']).to_pydatetime(), int(ultima['id']))
+    return pagina, proximo_cursor
+
+
+def contar_historico(conn, tabela, empresa_id, **filtros):
+    """Total de linhas do histórico com os filtros aplicados (contado no banco)."""
+    where, parametros = _montar_filtros(tabela, empresa_id, **filtros)
+    return conn.execute(text(f"SELECT count(*) FROM {tabela} WHERE {where}"), parametros).scalar_one()
+
+
+def listar_origens(conn, tabela, empresa_id):
+    """Arquivos de origem distintos da empresa (opções do filtro de origem)."""
+    coluna_origem = TABELAS_HISTORICO[tabela]['coluna_origem']
+    query = text(f"""
+        SELECT DISTINCT {coluna_origem} FROM {tabela}
+        WHERE empresa_id = :empresa_id AND {coluna_origem} IS NOT NULL
+        ORDER BY 1
+    """)
+    return [row[0] for row in conn.execute(query, {"empresa_id": empresa_id})]
+
+
+def exportar_historico_csv(conn, tabela, empresa_id, destino, **filtros):
+    """Grava o histórico filtrado em `destino` (arquivo binário) como CSV, direto do PostgreSQL.
+
+    O COPY (SELECT ...) TO STDOUT é lido em blocos e escrito no destino à medida que chega,
+    sem montar DataFrame: a memória desta etapa não depende do tamanho da exportação
+    (a entrega do arquivo ao navegador é responsabilidade de quem chama).
+    Mantém o formato dos downloads do app: separador ';' e BOM UTF-8 (utf-8-sig).
+    """
+    where, parametros = _montar_filtros(tabela, empresa_id, **filtros)
+    consulta = f"SELECT * FROM {tabela} WHERE {where} ORDER BY created_at DESC, id DESC"
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        # COPY não aceita parâmetros: os valores são incorporados com o escape do próprio driver
+        consulta = cursor.mogrify(re.sub(r'(?<!:):(\w+)', r'%(\1)s', consulta), parametros).decode('utf-8')
+        destino.write(codecs.BOM_UTF8)
+        cursor.copy_expert(
+            f"COPY ({consulta}) TO STDOUT WITH (FORMAT csv, HEADER, DELIMITER ';', ENCODING 'UTF8')",
+            destino,
+            size=BLOCO_EXPORTACAO,
+        )
+    finally:
+        cursor.close()
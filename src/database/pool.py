@@ -0,0 +1,84 @@
+"""
+Pool de conexões com medição do tempo de espera, para dimensionar o pool conforme a carga.
+"""
+
+import threading
+import time
+from collections import deque
+
+from sqlalchemy.pool import QueuePool
+
+# Quantidade de esperas recentes mantidas para as estatísticas
+AMOSTRAS_ESPERA = 500
+
+
+class QueuePoolMedido(QueuePool):
+    """QueuePool que registra quanto tempo cada checkout esperou por uma conexão.
+
+    A espera considera só a fila do pool; o tempo de abrir uma conexão nova no banco
+    (pool ainda não cheio ou overflow) é medido à parte.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._esperas = deque(maxlen=AMOSTRAS_ESPERA)
+        self._conexoes = deque(maxlen=AMOSTRAS_ESPERA)
+        self._esperas_lock = threading.Lock()
+        self._checkout_atual = threading.local()
+        self._total_checkouts = 0
+        self._total_conexoes = 0
+        self._timeouts = 0
+
+    def _do_get(self):
+        atual = self._checkout_atual
+        # O QueuePool chama _do_get recursivamente ao disputar o overflow: mede só a chamada externa
+        if getattr(atual, 'ativo', False):
+            return super()._do_get()
+        atual.ativo, atual.conexao = True, 0.0
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._esperas_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio - atual.conexao
+            with self._esperas_lock:
+                self._esperas.append(espera)
+                self._total_checkouts += 1
+            atual.ativo = False
+
+    def _create_connection(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            duracao = time.perf_counter() - inicio
+            if getattr(self._checkout_atual, 'ativo', False):
+                self._checkout_atual.conexao += duracao
+            with self._esperas_lock:
+                self._conexoes.append(duracao)
+                self._total_conexoes += 1
+
+    def estatisticas(self):
+        """Retrato atual do pool: conexões em uso/livres, tempos de espera na fila e de abertura de conexões (em ms)."""
+        with self._esperas_lock:
+            esperas = sorted(self._esperas)
+            conexoes = list(self._conexoes)
+            total, timeouts, novas = self._total_checkouts, self._timeouts, self._total_conexoes
+        return {
+            'tamanho': self.size(),
+            'em_uso': self.checkedout(),
+            'livres': self.checkedin(),
+            'overflow': max(self.overflow(), 0),
+            'max_overflow': self._max_overflow,
+            'checkouts': total,
+            'timeouts': timeouts,
+            'espera_media_ms': sum(esperas) / len(esperas) * 1000 if esperas else 0.0,
+            'espera_p95_ms': esperas[min(len(esperas) - 1, int(0.95 * len(esperas)))] * 1000 if esperas else 0.0,
+            'espera_max_ms': esperas[-1] * 1000 if esperas else 0.0,
+            'conexoes_novas': novas,
+            'conexao_media_ms': sum(conexoes) / len(conexoes) * 1000 if conexoes else 0.0,
+            'conexao_max_ms': max(conexoes) * 1000 if conexoes else 0.0,
+        }
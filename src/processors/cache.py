@@ -0,0 +1,145 @@
+"""
+Cache persistente de arquivos já processados (OFX e francesinhas).
+
+A chave é o SHA-256 do conteúdo do arquivo mais o tipo e a versão do parser, de modo
+que o mesmo extrato reenviado (por qualquer usuário, mesmo após reiniciar o serviço)
+não precisa ser lido de novo. Os resultados ficam em disco no formato Parquet e o
+diretório é limitado em tamanho, removendo primeiro os arquivos usados há mais tempo (LRU).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import pandas as pd
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Metadado gravado no Parquet com as colunas em que '' foi salvo como NaN
+_CHAVE_METADADO_VAZIOS = b'concilia_colunas_vazias'
+
+
+def chave_cache(conteudo, tipo, versao):
+    """Gera a chave do cache a partir dos bytes do arquivo, do tipo e da versão do parser."""
+    digest = hashlib.sha256(conteudo).hexdigest()
+    return f"{tipo}-v{versao}-{digest}"
+
+
+def _caminho(chave, diretorio):
+    return os.path.join(diretorio, f"{chave}.parquet")
+
+
+def _preparar_para_parquet(df):
+    """Converte colunas numéricas que usam '' para valor ausente em float com NaN.
+
+    Os parsers devolvem '' nas células vazias, o que gera colunas de tipo misto que o
+    Parquet não aceita. As colunas convertidas são registradas para a restauração.
+    """
+    df = df.copy()
+    colunas_vazias = []
+    for coluna in df.columns:
+        if df[coluna].dtype != object:
+            continue
+        valores = df[coluna]
+        vazios = valores.eq('')
+        if not vazios.any():
+            continue
+        preenchidos = valores[~vazios]
+        if preenchidos.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).all():
+            df[coluna] = pd.to_numeric(valores.mask(vazios), errors='coerce').astype('float64')
+            colunas_vazias.append(str(coluna))
+    return df, colunas_vazias
+
+
+def _restaurar_de_parquet(df, colunas_vazias):
+    for coluna in colunas_vazias:
+        df[coluna] = df[coluna].astype(object).where(df[coluna].notna(), '')
+    return df
+
+
+def ler_do_cache(chave, diretorio=None):
+    """Retorna o DataFrame guardado para a chave ou None se não houver (ou se o arquivo estiver corrompido)."""
+    diretorio = diretorio or config.PARSE_CACHE_DIR
+    caminho = _caminho(chave, diretorio)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        import pyarrow.parquet as pq
+
+        tabela = pq.read_table(caminho)
+        metadados = tabela.schema.metadata or {}
+        colunas_vazias = json.loads(metadados.get(_CHAVE_METADADO_VAZIOS, b'[]'))
+        df = _restaurar_de_parquet(tabela.to_pandas(), colunas_vazias)
+        # Atualiza a data de modificação para manter a ordem de uso (LRU)
+        os.utime(caminho)
+        return df
+    except Exception as e:
+        logger.warning("Falha ao ler o cache %s: %s", caminho, e)
+        return None
+
+
+def gravar_no_cache(chave, df, diretorio=None, limite_bytes=None):
+    """Grava o DataFrame no cache e remove as entradas mais antigas se o limite de tamanho for excedido."""
+    diretorio = diretorio or config.PARSE_CACHE_DIR
+    limite_bytes = limite_bytes if limite_bytes is not None else config.PARSE_CACHE_MAX_MB * 1024 * 1024
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(diretorio, exist_ok=True)
+        df_parquet, colunas_vazias = _preparar_para_parquet(df)
+        tabela = pa.Table.from_pandas(df_parquet, preserve_index=False)
+        metadados = dict(tabela.schema.metadata or {})
+        metadados[_CHAVE_METADADO_VAZIOS] = json.dumps(colunas_vazias).encode('utf-8')
+        tabela = tabela.replace_schema_metadata(metadados)
+
+        # Grava em arquivo temporário e renomeia, para que leitores concorrentes nunca vejam um arquivo pela metade
+        descritor, caminho_tmp = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+        os.close(descritor)
+        try:
+            pq.write_table(tabela, caminho_tmp)
+            os.replace(caminho_tmp, _caminho(chave, diretorio))
+        finally:
+            if os.path.exists(caminho_tmp):
+                os.remove(caminho_tmp)
+    except Exception as e:
+        logger.warning("Não foi possível gravar %s no cache: %s", chave, e)
+        return
+
+    _limitar_tamanho(diretorio, limite_bytes)
+
+
+def _limitar_tamanho(diretorio, limite_bytes):
+    """Remove as entradas usadas há mais tempo até o diretório caber no limite."""
+    entradas = []
+    for entrada in os.scandir(diretorio):
+        if entrada.is_file() and entrada.name.endswith('.parquet'):
+            estado = entrada.stat()
+            entradas.append((estado.st_mtime, estado.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        try:
+            os.remove(caminho)
+            total -= tamanho
+        except OSError:
+            # Outro processo pode ter removido a mesma entrada
+            pass
+
+
+def ler_com_cache(conteudo, tipo, versao, funcao_leitura):
+    """Retorna o resultado do cache ou executa funcao_leitura(conteudo) e guarda o resultado."""
+    chave = chave_cache(conteudo, tipo, versao)
+    df = ler_do_cache(chave)
+    if df is not None:
+        return df
+    df = funcao_leitura(conteudo)
+    if df is not None:
+        gravar_no_cache(chave, df)
+    return df
@@ -0,0 +1,125 @@
+"""
+Classificação de sacados em Pessoa Física (PF) ou Jurídica (PJ).
+
+Os nomes são deduplicados, os já conhecidos vêm da tabela concilia.sacado_classificacao
+em uma única consulta e apenas os novos passam pelo spaCy (nlp.pipe em lotes, só com o
+reconhecimento de entidades). Os resultados novos são gravados de volta em um único UPSERT.
+"""
+
+import pandas as pd
+from sqlalchemy import text
+
+from src.utils.multipadrao import obter_buscador
+
+COMPANY_SUFFIXES = [
+    'LTDA', 'S/A', 'SA', 'ME', 'EIRELI', 'CIA', 'MEI', 'EPP', 'EIRELE', 'S.A',
+    'ASSOCIACAO', 'SEGURANCA', 'AUTOMACAO', 'ROBOTICA', 'TECNOLOGIA',
+    'SOLUCOES', 'COMERCIO', 'FERRAMENTAS', 'CFC', 'CORRESPONDENTE',
+    'PET SERVICE', 'ORGANIZACAO', 'INSTALACOES', 'TREINAMENTOS',
+    'GREMIO', 'IGREJA', 'INDUSTRIA', 'SINDICATO', 'CONSTRUTORA', 'SOFTWARE',
+    'MOTORES', 'ARMAZENAGEM', 'CONTABEIS', 'ACO', 'EQUIPAMENTOS',
+    'EXPRESS', 'TRANSPORTES'
+]
+# Autômato com todos os sufixos: uma única varredura do nome em vez de um teste por sufixo
+BUSCADOR_SUFIXOS = obter_buscador(COMPANY_SUFFIXES)
+
+
+def get_classificacoes_conhecidas(conn, sacados):
+    """Busca em uma única consulta as classificações já gravadas para os sacados."""
+    if conn is None or not sacados:
+        return {}
+    query = text("""
+        SELECT sacado, classificacao
+        FROM concilia.sacado_classificacao
+        WHERE sacado = ANY(:sacados)
+    """)
+    result = conn.execute(query, {"sacados": list(sacados)})
+    return {row.sacado: row.classificacao for row in result}
+
+
+def salvar_classificacoes(conn, classificacoes):
+    """Grava (ou atualiza) as classificações em lote, com um único INSERT ... ON CONFLICT."""
+    if conn is None or not classificacoes:
+        return 0
+    query = text("""
+        INSERT INTO concilia.sacado_classificacao (sacado, classificacao)
+        SELECT * FROM unnest(CAST(:sacados AS text[]), CAST(:classificacoes AS text[]))
+        ON CONFLICT (sacado) DO UPDATE SET
+            classificacao = EXCLUDED.classificacao,
+            updated_at = CURRENT_TIMESTAMP
+    """)
+    conn.execute(query, {
+        "sacados": list(classificacoes.keys()),
+        "classificacoes": list(classificacoes.values()),
+    })
+    return len(classificacoes)
+
+
+def _componentes_ner(nlp):
+    """Componentes necessários para o NER (inclui o tok2vec só se o NER depender dele)."""
+    componentes = ['ner']
+    if 'tok2vec' in nlp.pipe_names:
+        ouvintes = getattr(nlp.get_pipe('tok2vec'), 'listening_components', [])
+        if 'ner' in ouvintes:
+            componentes.insert(0, 'tok2vec')
+    return componentes
+
+
+def classificar_nome(sacado, doc):
+    """Regras da classificação de um nome já processado pelo spaCy (as mesmas da classificação linha a linha)."""
+    # A primeira entidade de organização ou pessoa decide
+    for ent in doc.ents:
+        if ent.label_ == 'ORG':
+            return 'PJ'
+        if ent.label_ == 'PER':
+            return 'PF'
+
+    # Se não achou entidade, verifica se tem poucas palavras (provável PF)
+    if len(sacado.split()) <= 4:
+        return 'PF'
+
+    return 'Indefinido'
+
+
+def classificar_novos(nlp, sacados, batch_size=256):
+    """Classifica sacados ainda desconhecidos usando heurísticas e o NER do spaCy."""
+    classificacoes = {}
+    pendentes = []
+    for sacado_str in sacados:
+        # Siglas de empresa não precisam do spaCy
+        if BUSCADOR_SUFIXOS.contem_algum(sacado_str.upper()):
+            classificacoes[sacado_str] = 'PJ'
+        else:
+            pendentes.append(sacado_str)
+
+    if not pendentes:
+        return classificacoes
+
+    with nlp.select_pipes(enable=_componentes_ner(nlp)):
+        for sacado_str, doc in zip(pendentes, nlp.pipe(pendentes, batch_size=batch_size)):
+            classificacoes[sacado_str] = classificar_nome(sacado_str, doc)
+
+    return classificacoes
+
+
+def classificar_sacado_batch(conn, sacados_unicos, nlp, batch_size=256):
+    """Classifica um batch de sacados usando o BD, heurísticas e spaCy como fallback.
+
+    Com `conn` None a consulta e a gravação no banco são ignoradas.
+    """
+    sacados_validos = [s for s in dict.fromkeys(sacados_unicos) if isinstance(s, str) and s]
+    classificacoes = get_classificacoes_conhecidas(conn, sacados_validos)
+    sacados_novos = [s for s in sacados_validos if s not in classificacoes]
+
+    if nlp and sacados_novos:
+        novas = classificar_novos(nlp, sacados_novos, batch_size=batch_size)
+        salvar_classificacoes(conn, novas)
+        classificacoes.update(novas)
+
+    return classificacoes
+
+
+def classificar_serie(conn, sacados, nlp, batch_size=256):
+    """Classifica uma coluna de sacados processando cada nome distinto uma única vez."""
+    classificacoes = classificar_sacado_batch(conn, pd.unique(sacados.dropna()).tolist(), nlp, batch_size)
+    return sacados.map(classificacoes).fillna('Indefinido')
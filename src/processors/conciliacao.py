@@ -0,0 +1,68 @@
+"""
+Operações vetorizadas sobre o DataFrame de conciliação (chaves e aplicação das regras salvas).
+"""
+
+import hashlib
+
+import pandas as pd
+
+COLUNAS_REGRA = {'debito': 'débito', 'credito': 'crédito', 'historico': 'histórico'}
+
+
+def _como_texto(df, coluna):
+    """Equivalente vetorizado de str(row.get(coluna, '')), em dtype object."""
+    if coluna not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[coluna].astype(object).map(str).astype(object)
+
+
+def criar_chaves_regra(df):
+    """Cria a chave estável de regra de cada linha a partir do complemento, conforme a origem.
+
+    - Juros de Mora e Francesinha: texto antes do primeiro pipe.
+    - Demais (OFX): texto até o segundo pipe, se houver mais de dois trechos;
+      caso contrário, o complemento inteiro.
+    """
+    complemento = _como_texto(df, 'complemento')
+    origem = _como_texto(df, 'origem').str.lower()
+
+    partes = complemento.str.split('|')
+    primeiro = partes.str[0].str.strip()
+    segundo = partes.str[1].str.strip()
+
+    usa_primeiro_trecho = origem.str.contains('juros de mora', regex=False) | origem.str.contains('francesinha', regex=False)
+    chave_padrao = (primeiro + ' | ' + segundo).where(partes.str.len() > 2, complemento.str.strip())
+    return primeiro.where(usa_primeiro_trecho, chave_padrao)
+
+
+def gerar_hashes(textos):
+    """Gera o hash SHA256 de cada texto (None para textos vazios). Cada valor distinto é calculado uma vez."""
+    unicos = pd.unique(textos.dropna())
+    hashes = {
+        texto: hashlib.sha256(texto.encode('utf-8')).hexdigest() if texto else None
+        for texto in unicos
+    }
+    return textos.map(hashes).astype(object)
+
+
+def aplicar_regras_salvas(df_conciliacao, regras):
+    """Sobrescreve débito/crédito/histórico das linhas cuja chave tem regra salva.
+
+    `regras` é um DataFrame com as colunas complemento_hash, debito, credito e historico.
+    Apenas os valores preenchidos da regra sobrescrevem a linha. Retorna o DataFrame
+    atualizado e o número de linhas em que alguma regra foi encontrada.
+    """
+    if df_conciliacao.empty or regras.empty:
+        return df_conciliacao, 0
+
+    hashes = gerar_hashes(criar_chaves_regra(df_conciliacao))
+    regras = regras.drop_duplicates('complemento_hash', keep='last').set_index('complemento_hash')
+
+    encontradas = hashes.notna() & hashes.isin(regras.index)
+    for coluna_regra, coluna_df in COLUNAS_REGRA.items():
+        valores = hashes.map(regras[coluna_regra])
+        preenchidos = encontradas & valores.notna() & (valores != '')
+        if preenchidos.any():
+            df_conciliacao.loc[preenchidos, coluna_df] = valores[preenchidos]
+
+    return df_conciliacao, int(encontradas.sum())
@@ -0,0 +1,237 @@
+"""
+Leitura das planilhas de francesinha (relatório de boletos liquidados) exportadas pelo banco.
+"""
+
+import re
+from datetime import datetime
+
+import pandas as pd
+
+# Incrementar sempre que a saída de ler_francesinha mudar (invalida o cache de parse)
+VERSAO_PARSER_FRANCESINHA = 1
+
+# Mapeamento de colunas (índice na planilha -> nome no DataFrame)
+COLUNAS_MAPEAMENTO = {
+    1: 'Sacado',
+    5: 'Nosso_Numero',
+    11: 'Seu_Numero',
+    13: 'Dt_Previsao_Credito',
+    18: 'Vencimento',
+    21: 'Dt_Limite_Pgto',
+    25: 'Valor_RS',
+    28: 'Vlr_Mora',
+    29: 'Vlr_Desc',
+    31: 'Vlr_Outros_Acresc',
+    34: 'Dt_Liquid',
+    35: 'Vlr_Cobrado'
+}
+
+COLUNAS_DATA = ['Dt_Previsao_Credito', 'Vencimento', 'Dt_Limite_Pgto', 'Dt_Liquid']
+COLUNAS_VALOR = ['Valor_RS', 'Vlr_Mora', 'Vlr_Desc', 'Vlr_Outros_Acresc', 'Vlr_Cobrado']
+
+COLUNAS_ORDEM = [
+    'Sacado', 'Nosso_Numero', 'Seu_Numero', 'Dt_Previsao_Credito',
+    'Vencimento', 'Dt_Limite_Pgto', 'Valor_RS', 'Vlr_Mora',
+    'Vlr_Desc', 'Vlr_Outros_Acresc', 'Dt_Liquid', 'Vlr_Cobrado'
+]
+
+# Valores de ajuste do boleto, zerados nas linhas derivadas (juros, descontos, etc.)
+COLUNAS_AJUSTE = ['Vlr_Mora', 'Vlr_Desc', 'Vlr_Outros_Acresc']
+# Linhas derivadas geradas na francesinha completa: (coluna com o valor, Arquivo_Origem da linha)
+LINHAS_DERIVADAS = [('Vlr_Mora', 'Juros de Mora')]
+
+# Palavras que identificam linhas de cabeçalho/rodapé do relatório
+PALAVRAS_IGNORADAS = [
+    'ORDENADO', 'TIPO CONSULTA', 'CONTA CORRENTE',
+    'CEDENTE', 'RELATÓRIO', 'TOTAL', 'DATA INICIAL'
+]
+
+
+def _como_texto(coluna):
+    """Converte a coluna em texto sem espaços nas pontas, com '' nas células vazias."""
+    # Mantém dtype object para que os métodos .str usem o módulo re do Python (mesma semântica do str)
+    return coluna.astype(object).where(coluna.notna(), '').astype(str).astype(object).str.strip()
+
+
+def _para_float(valor):
+    try:
+        return float(valor)
+    except (TypeError, ValueError, OverflowError):
+        return 0.0
+
+
+def _formatar_data(valor):
+    if isinstance(valor, datetime):
+        return valor.strftime('%d/%m/%Y')
+    return str(valor)
+
+
+def mascara_linhas_validas(sacado, nosso_numero):
+    """Máscara das linhas de dados (descarta cabeçalhos, totais e linhas vazias do relatório).
+
+    Recebe as colunas Sacado e Nosso Número já convertidas com _como_texto.
+    """
+    padrao_ignoradas = '|'.join(re.escape(palavra) for palavra in PALAVRAS_IGNORADAS)
+    return (
+        (sacado.str.len() > 3) &
+        ~sacado.str.startswith('Sacado') &
+        (nosso_numero != '') &
+        ~sacado.str.match(r'^\d+-[A-Z]') &
+        ~sacado.str.upper().str.contains(padrao_ignoradas, regex=True)
+    )
+
+
+def extrair_colunas(df_raw):
+    """Seleciona as colunas mapeadas das linhas válidas e converte datas e valores em bloco."""
+    # Garante todas as colunas mapeadas (planilhas mais estreitas ficam com células vazias)
+    df_raw = df_raw.reindex(columns=list(COLUNAS_MAPEAMENTO))
+
+    sacado = _como_texto(df_raw[1])
+    nosso_numero = _como_texto(df_raw[5])
+    validas = mascara_linhas_validas(sacado, nosso_numero)
+    if not validas.any():
+        return pd.DataFrame()
+
+    selecionadas = df_raw.loc[validas]
+    colunas = {}
+    for col_idx, nome_col in COLUNAS_MAPEAMENTO.items():
+        coluna = selecionadas[col_idx]
+        preenchidas = coluna.notna()
+        saida = pd.Series('', index=coluna.index, dtype=object)
+
+        if nome_col in COLUNAS_DATA:
+            if pd.api.types.is_datetime64_any_dtype(coluna):
+                saida[preenchidas] = coluna[preenchidas].dt.strftime('%d/%m/%Y')
+            else:
+                saida[preenchidas] = coluna[preenchidas].map(_formatar_data)
+        elif nome_col in COLUNAS_VALOR:
+            if pd.api.types.is_numeric_dtype(coluna) and not pd.api.types.is_bool_dtype(coluna):
+                saida[preenchidas] = coluna[preenchidas].astype('float64')
+            else:
+                saida[preenchidas] = coluna[preenchidas].map(_para_float)
+        else:
+            saida = _como_texto(coluna)
+
+        colunas[nome_col] = saida.to_numpy(dtype=object)
+
+    # infer_objects reproduz os tipos que o DataFrame montado linha a linha teria
+    return pd.DataFrame(colunas)[COLUNAS_ORDEM].infer_objects()
+
+
+def _valor_celula(valor):
+    """Normaliza um valor lido célula a célula como o pd.read_excel faz (números inteiros viram int)."""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _linhas_xlsx(arquivo):
+    """Itera as linhas da primeira planilha de um .xlsx sem carregar o arquivo inteiro (modo read-only)."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        for linha in ws.iter_rows(max_col=max(COLUNAS_MAPEAMENTO) + 1, values_only=True):
+            yield [_valor_celula(linha[i]) if i < len(linha) else None for i in COLUNAS_MAPEAMENTO]
+    finally:
+        wb.close()
+
+
+def _linhas_xls(arquivo):
+    """Itera as linhas da primeira planilha de um .xls (xlrd com carregamento sob demanda).
+
+    O formato binário antigo não permite leitura parcial da planilha, mas o on_demand evita
+    carregar as demais abas e as linhas não são copiadas para um DataFrame de 36 colunas.
+    """
+    import xlrd
+
+    book = xlrd.open_workbook(file_contents=arquivo.read(), on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for i in range(sheet.nrows):
+            celulas = sheet.row(i)
+            linha = []
+            for col_idx in COLUNAS_MAPEAMENTO:
+                celula = celulas[col_idx] if col_idx < len(celulas) else None
+                if celula is None or celula.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                    linha.append(None)
+                elif celula.ctype == xlrd.XL_CELL_DATE:
+                    linha.append(xlrd.xldate.xldate_as_datetime(celula.value, book.datemode))
+                elif celula.ctype == xlrd.XL_CELL_BOOLEAN:
+                    linha.append(bool(celula.value))
+                else:
+                    linha.append(_valor_celula(celula.value))
+            yield linha
+    finally:
+        book.release_resources()
+
+
+def ler_francesinha_streaming(arquivo_xls, tamanho_lote=5000):
+    """Lê a francesinha linha a linha, mantendo só as 12 colunas mapeadas e as linhas válidas.
+
+    O pico de memória fica limitado ao lote em processamento mais o resultado, em vez da
+    planilha inteira. Diferente do pd.read_excel, os valores não passam pela inferência de
+    tipo da coluna inteira: textos numéricos (ex.: nosso número com zeros à esquerda)
+    permanecem como estão na planilha.
+    """
+    assinatura = arquivo_xls.read(4)
+    arquivo_xls.seek(0)
+    # .xlsx é um ZIP ('PK'); o .xls antigo é um documento OLE2
+    linhas = _linhas_xlsx(arquivo_xls) if assinatura.startswith(b'PK') else _linhas_xls(arquivo_xls)
+
+    partes = []
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho_lote:
+            partes.append(extrair_colunas(pd.DataFrame(lote, columns=list(COLUNAS_MAPEAMENTO))))
+            lote = []
+    if lote:
+        partes.append(extrair_colunas(pd.DataFrame(lote, columns=list(COLUNAS_MAPEAMENTO))))
+
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return pd.DataFrame()
+    return pd.concat(partes, ignore_index=True).astype(object).infer_objects()
+
+
+def ler_francesinha(arquivo_xls, streaming=False):
+    """Extrai dados financeiros do Excel e retorna DataFrame limpo. Levanta exceção se o arquivo for inválido."""
+    if streaming:
+        return ler_francesinha_streaming(arquivo_xls)
+    # Ler Excel sem cabeçalho
+    df_raw = pd.read_excel(arquivo_xls, header=None)
+    return extrair_colunas(df_raw)
+
+
+def gerar_linhas_derivadas(df, coluna_valor, origem):
+    """Cria uma linha derivada para cada boleto com valor positivo em `coluna_valor`.
+
+    A linha derivada copia o boleto, usa esse valor como Valor_RS e Vlr_Cobrado, zera os
+    ajustes (COLUNAS_AJUSTE) e recebe `origem` em Arquivo_Origem. Mantém a ordem e o índice
+    das linhas de origem. Ex.: gerar_linhas_derivadas(df, 'Vlr_Mora', 'Juros de Mora').
+    """
+    # Células vazias ('') ou não numéricas contam como zero
+    valores = pd.to_numeric(df[coluna_valor], errors='coerce').fillna(0).astype(float)
+    mascara = valores > 0
+
+    derivadas = df.loc[mascara].copy()
+    derivadas['Valor_RS'] = valores[mascara]
+    derivadas['Vlr_Cobrado'] = valores[mascara]
+    for coluna in COLUNAS_AJUSTE:
+        derivadas[coluna] = 0
+    derivadas['Arquivo_Origem'] = origem
+    return derivadas
+
+
+def adicionar_linhas_derivadas(df, derivacoes):
+    """Acrescenta ao final do DataFrame as linhas derivadas de cada (coluna_valor, origem), nessa ordem.
+
+    Retorna o DataFrame completo (índice renumerado) e a quantidade de linhas acrescentadas.
+    """
+    partes = [gerar_linhas_derivadas(df, coluna_valor, origem) for coluna_valor, origem in derivacoes]
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return df, 0
+    return pd.concat([df] + partes, ignore_index=True), sum(len(parte) for parte in partes)
@@ -0,0 +1,61 @@
+"""
+Carregamento sob demanda do modelo spaCy usado na classificação de sacados.
+
+O modelo só é carregado na primeira classificação (ou pelo aquecimento em segundo plano),
+sem os componentes que o app não usa, e fica em memória para todo o processo.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_modelo = None
+_erro = None
+
+
+def obter_modelo(nome, excluir=()):
+    """Retorna o modelo carregado, carregando-o na primeira chamada. Levanta OSError se não estiver instalado.
+
+    Chamadas concorrentes (ex.: o aquecimento em segundo plano) aguardam o mesmo carregamento.
+    """
+    global _modelo, _erro
+    if _modelo is not None:
+        return _modelo
+    with _lock:
+        if _modelo is not None:
+            return _modelo
+        if _erro is not None:
+            raise _erro
+
+        import spacy
+
+        inicio = time.perf_counter()
+        try:
+            _modelo = spacy.load(nome, exclude=list(excluir))
+        except OSError as e:
+            _erro = e
+            raise
+        # O tempo só é registrado no carregamento real, não nas reutilizações do modelo em memória
+        logger.info("Modelo spaCy '%s' carregado em %.2fs (componentes: %s)",
+                    nome, time.perf_counter() - inicio, ', '.join(_modelo.pipe_names))
+        return _modelo
+
+
+def aquecer_em_segundo_plano(nome, excluir=()):
+    """Inicia o carregamento do modelo em uma thread daemon, sem bloquear a renderização."""
+    if _modelo is not None or _lock.locked():
+        return None
+
+    def _aquecer():
+        try:
+            obter_modelo(nome, excluir)
+        except Exception as e:
+            logger.warning("Falha ao pré-carregar o modelo spaCy '%s': %s", nome, e)
+
+    thread = threading.Thread(target=_aquecer, name="aquecimento-spacy", daemon=True)
+    thread.start()
+    return thread
+
@@ -0,0 +1,120 @@
+"""
+Leitura de extratos OFX, com suporte a processamento paralelo de vários arquivos.
+"""
+
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from ofxparse import OfxParser
+
+from src.processors.cache import chave_cache, gravar_no_cache, ler_do_cache
+
+# Incrementar sempre que a saída de ler_ofx mudar (invalida o cache de parse)
+VERSAO_PARSER_OFX = 1
+
+
+def ler_ofx(conteudo):
+    """Converte o conteúdo (bytes) de um arquivo OFX em DataFrame. Levanta exceção se o arquivo for inválido."""
+    ofx = OfxParser.parse(io.BytesIO(conteudo))
+    transacoes = []
+
+    for conta in ofx.accounts:
+        for transacao in conta.statement.transactions:
+            # Define o tipo com base no sinal do valor (TRNAMT)
+            tipo_transacao = 'DEBIT' if transacao.amount < 0 else 'CREDIT'
+
+            transacoes.append({
+                'data': transacao.date,
+                'valor': transacao.amount,
+                'tipo': tipo_transacao,
+                'id': transacao.id,
+                'memo': transacao.memo,
+                'payee': transacao.payee,
+                'checknum': transacao.checknum,
+            })
+
+    return pd.DataFrame(transacoes)
+
+
+def _ler_ofx_worker(conteudo):
+    """Executado no processo filho: devolve (DataFrame, None) ou (None, mensagem de erro)."""
+    try:
+        return ler_ofx(conteudo), None
+    except Exception as e:
+        return None, str(e)
+
+
+def processar_ofx_paralelo(arquivos, max_workers=None, ao_concluir=None, usar_cache=True):
+    """Processa vários arquivos OFX em um pool de processos.
+
+    `arquivos` é uma lista de tuplas (nome, conteudo_bytes). Retorna uma lista de
+    dicionários {'nome', 'df', 'erro'} na mesma ordem do upload. Um arquivo com erro
+    não interrompe o lote: o erro é registrado apenas no resultado daquele arquivo.
+    `ao_concluir(concluidos, total, resultado)` é chamado a cada arquivo finalizado.
+    Com `usar_cache`, arquivos já lidos antes (mesmo conteúdo) vêm do cache em disco
+    e apenas os demais são enviados aos processos.
+    """
+    total = len(arquivos)
+    resultados = [None] * total
+    if total == 0:
+        return resultados
+
+    concluidos = 0
+
+    def registrar(indice, df, erro):
+        nonlocal concluidos
+        concluidos += 1
+        resultados[indice] = {'nome': arquivos[indice][0], 'df': df, 'erro': erro}
+        if ao_concluir:
+            ao_concluir(concluidos, total, resultados[indice])
+
+    chaves = {}
+    pendentes = []
+    for indice, (_, conteudo) in enumerate(arquivos):
+        if usar_cache:
+            chaves[indice] = chave_cache(conteudo, 'ofx', VERSAO_PARSER_OFX)
+            df = ler_do_cache(chaves[indice])
+            if df is not None:
+                registrar(indice, df, None)
+                continue
+        pendentes.append(indice)
+
+    def registrar_lido(indice, df, erro):
+        if usar_cache and df is not None:
+            gravar_no_cache(chaves[indice], df)
+        registrar(indice, df, erro)
+
+    if not pendentes:
+        return resultados
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(pendentes)))
+
+    # Para um único arquivo (ou um único worker) não compensa subir processos
+    if max_workers == 1:
+        for indice in pendentes:
+            df, erro = _ler_ofx_worker(arquivos[indice][1])
+            registrar_lido(indice, df, erro)
+        return resultados
+
+    # 'spawn' evita fork de um processo multithread (servidor do Streamlit)
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto) as executor:
+        futuros = {
+            executor.submit(_ler_ofx_worker, arquivos[indice][1]): indice
+            for indice in pendentes
+        }
+        for futuro in as_completed(futuros):
+            indice = futuros[futuro]
+            try:
+                df, erro = futuro.result()
+            except Exception as e:
+                # Falha do próprio processo filho (ex.: worker encerrado)
+                df, erro = None, str(e)
+            registrar_lido(indice, df, erro)
+
+    return resultados
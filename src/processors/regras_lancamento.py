@@ -0,0 +1,145 @@
+"""
+Regras de lançamento (débito, crédito e histórico) aplicadas às transações do OFX.
+
+As regras ficam em uma tabela declarativa: cada regra testa um campo da transação
+(memo ou payee) com um texto ou expressão regular, restrita a um tipo (CREDIT/DEBIT),
+e define uma ou mais saídas. Para cada coluna de saída vale a primeira regra, em ordem
+de prioridade, que casar e tiver valor para aquela coluna. A tabela é compilada uma
+única vez em máscaras vetorizadas e as três colunas são calculadas na mesma passada.
+"""
+
+import logging
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.utils.multipadrao import obter_buscador
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_SAIDA = ('debito', 'credito', 'historico')
+
+# Regras padrão (equivalentes às antigas funções calcular_debito/credito/historico).
+# maiusculas=True compara com o campo sem espaços nas pontas e em maiúsculas;
+# maiusculas=False compara com o texto original (sensível a maiúsculas).
+REGRAS_LANCAMENTO_PADRAO = [
+    # --- CREDIT ---
+    {'prioridade': 10, 'tipo': 'CREDIT', 'campo': 'memo', 'padrao': 'CR COMPRAS', 'regex': False, 'maiusculas': False, 'credito': '15254'},
+    {'prioridade': 20, 'tipo': 'CREDIT', 'campo': 'memo', 'padrao': 'CR COMPRAS', 'regex': False, 'maiusculas': True, 'historico': '601'},
+    {'prioridade': 30, 'tipo': 'CREDIT', 'campo': 'memo', 'padrao': 'TARIFA ENVIO PIX', 'regex': False, 'maiusculas': True, 'historico': '150'},
+    {'prioridade': 40, 'tipo': 'CREDIT', 'campo': 'payee', 'padrao': r'\*\*\*\.\d{3}\.\d{3}-\*\*', 'regex': True, 'maiusculas': False, 'credito': '10550'},
+    {'prioridade': 50, 'tipo': 'CREDIT', 'campo': 'payee', 'padrao': r'\d{2}\.\d{3}\.\d{3} \d{4}-\d{2}', 'regex': True, 'maiusculas': False, 'credito': '13709'},
+    # Padrões herdados da regra de histórico com escape duplo: só casam com barras invertidas
+    # literais no payee. Mantidos como estavam para não alterar os lançamentos gerados.
+    {'prioridade': 60, 'tipo': 'CREDIT', 'campo': 'payee', 'padrao': r'\\*\\*\\*\\.\\d{3}\\.\\d{3}-\\*\\*', 'regex': True, 'maiusculas': False, 'historico': '78'},
+    {'prioridade': 70, 'tipo': 'CREDIT', 'campo': 'payee', 'padrao': r'\\d{2}\\.\\d{3}\\.\\d{3} \\d{4}-\\d{2}', 'regex': True, 'maiusculas': False, 'historico': '78'},
+    # --- DEBIT ---
+    {'prioridade': 110, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': 'TARIFA COBRANÇA', 'regex': False, 'maiusculas': True, 'debito': '52877', 'historico': '8'},
+    {'prioridade': 120, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': 'TARIFA ENVIO PIX', 'regex': False, 'maiusculas': True, 'debito': '52878', 'historico': '150'},
+    {'prioridade': 130, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': 'DÉBITO PACOTE SERVIÇOS', 'regex': False, 'maiusculas': True, 'debito': '52914', 'historico': '111'},
+    {'prioridade': 140, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': 'DEB.PARCELAS SUBSC./INTEGR.', 'regex': False, 'maiusculas': True, 'debito': '84618', 'historico': '37'},
+    {'prioridade': 150, 'tipo': 'DEBIT', 'campo': 'payee', 'padrao': 'UNIMED', 'regex': False, 'maiusculas': True, 'debito': '23921', 'historico': '88'},
+    {'prioridade': 160, 'tipo': 'DEBIT', 'campo': 'payee', 'padrao': 'CÉDULA DE PRESENÇA', 'regex': False, 'maiusculas': True, 'debito': '26186', 'historico': '58'},
+    {'prioridade': 170, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': 'SALARIO', 'regex': False, 'maiusculas': True, 'debito': '20817', 'historico': '88'},
+    {'prioridade': 180, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': 'AGUA E ESGOTO', 'regex': False, 'maiusculas': True, 'debito': '52197', 'historico': '88'},
+]
+
+
+def _chave_regras(regras):
+    """Representação imutável da tabela de regras (usada como chave do cache de compilação)."""
+    return tuple(
+        (
+            int(regra.get('prioridade') or 0),
+            str(regra.get('tipo') or '').strip().upper(),
+            regra['campo'],
+            regra['padrao'],
+            bool(regra.get('regex')),
+            bool(regra.get('maiusculas')),
+        ) + tuple(str(regra.get(saida) or '') for saida in CAMPOS_SAIDA)
+        for regra in regras
+    )
+
+
+@lru_cache(maxsize=32)
+def _compilar(chave):
+    # sorted é estável: regras com a mesma prioridade mantêm a ordem da tabela
+    compiladas = []
+    for prioridade, tipo, campo, padrao, regex, maiusculas, *saidas in sorted(chave, key=lambda r: r[0]):
+        if regex:
+            # Regras da empresa vêm do banco: uma expressão inválida é ignorada, sem derrubar as demais
+            try:
+                padrao = re.compile(padrao)
+            except re.error as e:
+                logger.warning("Regra de lançamento ignorada (prioridade %s, %s): expressão regular inválida %r: %s",
+                               prioridade, campo, padrao, e)
+                continue
+        compiladas.append({
+            'tipo': tipo,
+            'campo': campo,
+            'padrao': padrao,
+            'regex': regex,
+            'maiusculas': maiusculas,
+            'saidas': dict(zip(CAMPOS_SAIDA, saidas)),
+        })
+    return tuple(compiladas)
+
+
+def compilar_regras(regras):
+    """Ordena por prioridade e pré-compila as expressões regulares. O resultado fica em cache por tabela.
+
+    Regras com expressão regular inválida são descartadas com um aviso no log.
+    """
+    return _compilar(_chave_regras(regras))
+
+
+def _texto(df, coluna):
+    """Coluna como texto (dtype object, para usar o módulo re do Python), com '' nos nulos."""
+    if coluna not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    serie = df[coluna]
+    return serie.astype(object).where(serie.notna(), '').astype(str).astype(object)
+
+
+def aplicar_regras_lancamento(df, regras_compiladas):
+    """Calcula as colunas débito, crédito e histórico para as transações em uma única passada."""
+    tipo = _texto(df, 'tipo').str.strip().str.upper()
+    campos = {}
+    for coluna in ('memo', 'payee'):
+        original = _texto(df, coluna)
+        campos[(coluna, False)] = original
+        campos[(coluna, True)] = original.str.strip().str.upper()
+
+    # Padrões literais de um mesmo campo são buscados juntos, em uma varredura por texto distinto
+    literais = {}
+    for regra in regras_compiladas:
+        if not regra['regex']:
+            literais.setdefault((regra['campo'], regra['maiusculas']), []).append(regra['padrao'])
+    ocorrencias = {}
+    for chave, padroes in literais.items():
+        buscador = obter_buscador(padroes)
+        ocorrencias[chave] = (buscador, buscador.matriz_lote(campos[chave]))
+
+    mascaras_tipo = {}
+    mascaras = []
+    for regra in regras_compiladas:
+        if regra['tipo'] not in mascaras_tipo:
+            mascaras_tipo[regra['tipo']] = (tipo == regra['tipo']).to_numpy()
+        chave = (regra['campo'], regra['maiusculas'])
+        if regra['regex']:
+            casou = campos[chave].str.contains(regra['padrao'], regex=True, na=False).to_numpy(dtype=bool)
+        else:
+            buscador, matriz = ocorrencias[chave]
+            casou = matriz[:, buscador.indice(regra['padrao'])]
+        mascaras.append(mascaras_tipo[regra['tipo']] & casou)
+
+    resultado = pd.DataFrame(index=df.index)
+    for saida in CAMPOS_SAIDA:
+        condicoes = [m for m, regra in zip(mascaras, regras_compiladas) if regra['saidas'][saida]]
+        valores = [regra['saidas'][saida] for regra in regras_compiladas if regra['saidas'][saida]]
+        if condicoes:
+            resultado[saida] = np.select(condicoes, valores, default='').astype(object)
+        else:
+            resultado[saida] = pd.Series('', index=df.index, dtype=object)
+    return resultado
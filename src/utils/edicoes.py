@@ -0,0 +1,77 @@
+"""
+Sincronização das edições do st.data_editor com o DataFrame mestre, célula a célula.
+
+O editor informa apenas as células alteradas (`edited_rows`: posição da linha na tabela
+exibida -> {coluna: novo valor}). Só essas células são gravadas no DataFrame mestre e cada
+alteração efetiva entra em um registro (log), usado para desfazer e para salvar incrementalmente.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+
+# Colunas de controle da interface, aplicadas mas não registradas no log
+COLUNAS_SEM_LOG = ('selecionar',)
+
+
+def _iguais(a, b):
+    if pd.isna(a) and pd.isna(b):
+        return True
+    return a == b
+
+
+def aplicar_edicoes(df, indices_exibidos, linhas_editadas, log=None):
+    """Aplica ao DataFrame mestre as células alteradas no editor.
+
+    `indices_exibidos` são os índices (na ordem) das linhas mostradas no editor. Células cujo valor
+    já é o do mestre são ignoradas, então reaplicar o mesmo delta em reruns seguintes não tem custo.
+    Retorna os índices das linhas efetivamente alteradas.
+    """
+    alteradas = []
+    for posicao, celulas in linhas_editadas.items():
+        posicao = int(posicao)
+        if posicao >= len(indices_exibidos):
+            continue
+        indice = indices_exibidos[posicao]
+        linha_alterada = False
+        for coluna, novo in celulas.items():
+            if coluna not in df.columns:
+                continue
+            anterior = df.at[indice, coluna]
+            if _iguais(anterior, novo):
+                continue
+            df.at[indice, coluna] = novo
+            linha_alterada = True
+            if log is not None and coluna not in COLUNAS_SEM_LOG:
+                log.append({
+                    'indice': indice, 'coluna': coluna,
+                    'anterior': anterior, 'novo': novo, 'momento': datetime.now(),
+                })
+        if linha_alterada:
+            alteradas.append(indice)
+    return alteradas
+
+
+def registrar_alteracoes(df, indices, colunas, novos_valores, log):
+    """Registra no log alterações feitas fora do editor (ex.: edição em lote) antes de aplicá-las."""
+    momento = datetime.now()
+    for coluna, novo in zip(colunas, novos_valores):
+        for indice in indices:
+            anterior = df.at[indice, coluna]
+            if not _iguais(anterior, novo):
+                log.append({'indice': indice, 'coluna': coluna, 'anterior': anterior, 'novo': novo, 'momento': momento})
+
+
+def desfazer_ultima(df, log):
+    """Reverte a alteração mais recente do log. Retorna o índice da linha revertida (ou None)."""
+    if not log:
+        return None
+    alteracao = log.pop()
+    if alteracao['indice'] in df.index and alteracao['coluna'] in df.columns:
+        df.at[alteracao['indice'], alteracao['coluna']] = alteracao['anterior']
+    return alteracao['indice']
+
+
+def linhas_alteradas(log):
+    """Índices distintos das linhas alteradas desde o início do log (base para salvar só o que mudou)."""
+    return list(dict.fromkeys(alteracao['indice'] for alteracao in log))
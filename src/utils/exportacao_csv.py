@@ -0,0 +1,50 @@
+"""
+Geração dos CSVs de download (separador ';', UTF-8 com BOM) com memorização por versão dos dados.
+"""
+
+import hashlib
+import io
+
+import pandas as pd
+
+
+def dataframe_para_csv(df):
+    """Converte o DataFrame em bytes CSV codificando uma única vez (direto em um buffer binário)."""
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, sep=';', encoding='utf-8-sig')
+    return buffer.getvalue()
+
+
+def versao_dataframe(df):
+    """Impressão digital do conteúdo (valores, índice, ordem das linhas e colunas).
+
+    Para DataFrames editados com frequência, prefira passar a `csv_memorizado` um contador de
+    versão incrementado a cada alteração: evita recalcular o hash a cada rerun.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if len(df):
+        # Os hashes por linha são concatenados na ordem: reordenar as linhas muda a versão
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return (digest.hexdigest(), df.shape, tuple(map(str, df.columns)))
+
+
+def csv_memorizado(cache, chave, df, colunas=None, versao=None):
+    """Retorna os bytes CSV de `df[colunas]`, reaproveitando o último resultado se os dados não mudaram.
+
+    `cache` é um dicionário persistente entre reruns (ex.: guardado no st.session_state), com uma
+    entrada por `chave`. `versao` identifica o estado dos dados; se omitida, é calculada pelo conteúdo.
+    Com `versao` informada, o subconjunto de colunas só é copiado quando o CSV precisa ser gerado.
+    """
+    if colunas is not None:
+        colunas = tuple(c for c in colunas if c in df.columns)
+    if versao is None:
+        versao = versao_dataframe(df if colunas is None else df[list(colunas)])
+
+    assinatura = (versao, colunas)
+    memorizado = cache.get(chave)
+    if memorizado is not None and memorizado[0] == assinatura:
+        return memorizado[1]
+
+    dados = dataframe_para_csv(df if colunas is None else df[list(colunas)])
+    cache[chave] = (assinatura, dados)
+    return dados
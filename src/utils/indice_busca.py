@@ -0,0 +1,71 @@
+"""
+Índice de busca textual em todas as colunas de um DataFrame (filtro universal do editor).
+
+O texto de cada linha é normalizado (minúsculas, sem acentos) e concatenado uma única vez;
+cada busca é então uma varredura de substring nessa coluna pré-calculada. Quando células
+são editadas, apenas as linhas alteradas são recalculadas.
+"""
+
+import unicodedata
+
+import pandas as pd
+
+# Separa as colunas no texto concatenado, para que um termo não case atravessando duas células
+SEPARADOR = '\x1f'
+# Buscas recentes guardadas (ex.: cada tecla digitada no filtro)
+RESULTADOS_EM_CACHE = 32
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ('JOÃO' -> 'joao')."""
+    decomposto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def _normalizar_serie(serie):
+    # Cada valor distinto é normalizado uma vez
+    valores = serie.astype(object).map(str)
+    unicos = pd.unique(valores)
+    return valores.map({valor: normalizar(valor) for valor in unicos}).astype(object)
+
+
+class IndiceBusca:
+    """Texto normalizado por linha de um DataFrame, para filtrar por substring em todas as colunas."""
+
+    def __init__(self, df, colunas_ignoradas=()):
+        self.df = df
+        self.colunas = [c for c in df.columns if c not in colunas_ignoradas]
+        self.textos = self._montar(df)
+        self._resultados = {}
+
+    def _montar(self, df):
+        if df.empty or not self.colunas:
+            return pd.Series('', index=df.index, dtype=object)
+        partes = [_normalizar_serie(df[coluna]) for coluna in self.colunas]
+        texto = partes[0]
+        for parte in partes[1:]:
+            texto = texto + SEPARADOR + parte
+        return texto.astype(object)
+
+    def pertence_a(self, df):
+        """Indica se o índice foi montado para este DataFrame (mesmo objeto e mesmas linhas/colunas)."""
+        return self.df is df and self.textos.index.equals(df.index) and all(c in df.columns for c in self.colunas)
+
+    def atualizar(self, indices):
+        """Recalcula apenas as linhas informadas (após edição de células)."""
+        indices = [i for i in indices if i in self.textos.index]
+        if not indices:
+            return
+        self.textos.loc[indices] = self._montar(self.df.loc[indices])
+        self._resultados.clear()
+
+    def filtrar(self, termo):
+        """Índices das linhas que contêm o termo em alguma coluna (sem diferenciar maiúsculas/acentos)."""
+        termo = normalizar(termo)
+        if not termo:
+            return self.textos.index
+        if termo not in self._resultados:
+            if len(self._resultados) >= RESULTADOS_EM_CACHE:
+                self._resultados.clear()
+            self._resultados[termo] = self.textos.index[self.textos.str.contains(termo, regex=False)]
+        return self._resultados[termo]
@@ -0,0 +1,131 @@
+"""
+Busca de várias palavras-chave em um texto com uma única varredura (algoritmo Aho–Corasick).
+
+Substitui testes do tipo `any(palavra in texto for palavra in LISTA)`, cujo custo cresce
+com o número de palavras. O autômato é montado uma vez por conjunto de palavras e fica
+em cache (veja obter_buscador). Usa a extensão em C `pyahocorasick` quando instalada e,
+caso contrário, uma implementação em Python puro com o mesmo comportamento.
+"""
+
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    import ahocorasick
+except ImportError:  # Dependência opcional
+    ahocorasick = None
+
+
+class BuscadorMultiPadrao:
+    """Autômato que encontra todas as ocorrências de um conjunto fixo de palavras (substrings)."""
+
+    def __init__(self, palavras):
+        # Palavras únicas, na ordem recebida; o índice de cada uma é a coluna em matriz_lote
+        self.palavras = tuple(dict.fromkeys(p for p in palavras if p))
+        self._indices = {palavra: i for i, palavra in enumerate(self.palavras)}
+
+        if ahocorasick is not None:
+            self._automato = ahocorasick.Automaton()
+            for i, palavra in enumerate(self.palavras):
+                self._automato.add_word(palavra, i)
+            if self.palavras:
+                self._automato.make_automaton()
+        else:
+            self._automato = None
+            self._montar_automato()
+
+    def _montar_automato(self):
+        # Trie: transicoes[estado] = {caractere: próximo estado}; saidas[estado] = índices das palavras
+        self._transicoes = [{}]
+        self._saidas = [()]
+        for i, palavra in enumerate(self.palavras):
+            estado = 0
+            for caractere in palavra:
+                proximo = self._transicoes[estado].get(caractere)
+                if proximo is None:
+                    proximo = len(self._transicoes)
+                    self._transicoes[estado][caractere] = proximo
+                    self._transicoes.append({})
+                    self._saidas.append(())
+                estado = proximo
+            self._saidas[estado] += (i,)
+
+        # Links de falha em largura: cada estado herda as saídas do seu sufixo mais longo
+        self._falha = [0] * len(self._transicoes)
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falha[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falha[falha]
+                destino = self._transicoes[falha].get(caractere, 0)
+                self._falha[proximo] = destino if destino != proximo else 0
+                self._saidas[proximo] += self._saidas[self._falha[proximo]]
+
+    def _indices_encontrados(self, texto):
+        """Índices das palavras presentes no texto, na ordem da primeira ocorrência."""
+        if not texto or not self.palavras:
+            return []
+        encontrados = {}
+        if self._automato is not None:
+            for _, indice in self._automato.iter(texto):
+                encontrados.setdefault(indice, None)
+            return list(encontrados)
+
+        transicoes, falha, saidas = self._transicoes, self._falha, self._saidas
+        estado = 0
+        for caractere in texto:
+            while estado and caractere not in transicoes[estado]:
+                estado = falha[estado]
+            estado = transicoes[estado].get(caractere, 0)
+            for indice in saidas[estado]:
+                encontrados.setdefault(indice, None)
+        return list(encontrados)
+
+    def buscar(self, texto):
+        """Retorna todas as palavras encontradas no texto (sem repetição)."""
+        return [self.palavras[i] for i in self._indices_encontrados(texto)]
+
+    def contem_algum(self, texto):
+        """Indica se ao menos uma das palavras aparece no texto."""
+        return bool(self._indices_encontrados(texto))
+
+    def matriz_lote(self, serie):
+        """Matriz booleana (linhas da série x palavras) indicando quais palavras aparecem em cada linha.
+
+        Cada texto distinto é varrido uma única vez, o que é vantajoso em colunas com muitos
+        valores repetidos (memo, payee, sacado). Valores nulos contam como texto vazio.
+        """
+        valores = serie.astype(object).where(serie.notna(), '')
+        codigos, unicos = pd.factorize(valores)
+        matriz_unicos = np.zeros((len(unicos), len(self.palavras)), dtype=bool)
+        for linha, texto in enumerate(unicos):
+            indices = self._indices_encontrados(str(texto))
+            if indices:
+                matriz_unicos[linha, indices] = True
+        return matriz_unicos[codigos]
+
+    def indice(self, palavra):
+        """Coluna da palavra na matriz retornada por matriz_lote."""
+        return self._indices[palavra]
+
+    def buscar_lote(self, serie):
+        """Para cada linha da série, a tupla de palavras encontradas."""
+        matriz = self.matriz_lote(serie)
+        palavras = np.array(self.palavras, dtype=object)
+        return pd.Series([tuple(palavras[linha]) for linha in matriz], index=serie.index, dtype=object)
+
+
+@lru_cache(maxsize=64)
+def _obter_buscador(palavras):
+    return BuscadorMultiPadrao(palavras)
+
+
+def obter_buscador(palavras):
+    """Retorna o buscador para o conjunto de palavras, montando o autômato só na primeira vez."""
+    return _obter_buscador(tuple(palavras))
@@ -0,0 +1,90 @@
+"""
+Equivalência da classificação em lote de sacados (classificar_serie) com a classificação
+original, linha a linha (classificar_sacado do app), usando um NER determinístico no lugar do spaCy.
+"""
+
+import unittest
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pandas as pd
+
+from src.processors.classificacao import COMPANY_SUFFIXES, classificar_serie
+
+# Palavras que o NER falso reconhece como entidade
+PESSOAS = {'MARIA', 'Maria', 'JOSE', 'Jose'}
+ORGANIZACOES = {'BANCO', 'Banco', 'UNIMED', 'COOPERATIVA'}
+
+
+class NlpFalso:
+    """Imita a interface do spaCy usada na classificação: pipe_names, select_pipes, pipe e __call__."""
+
+    pipe_names = ['tok2vec', 'ner']
+
+    def get_pipe(self, nome):
+        return SimpleNamespace(listening_components=['ner'])
+
+    @contextmanager
+    def select_pipes(self, enable):
+        yield
+
+    def __call__(self, texto):
+        ents = []
+        for palavra in texto.split():
+            if palavra in PESSOAS:
+                ents.append(SimpleNamespace(label_='PER'))
+            elif palavra in ORGANIZACOES:
+                ents.append(SimpleNamespace(label_='ORG'))
+            elif palavra == 'SC':
+                ents.append(SimpleNamespace(label_='LOC'))
+        return SimpleNamespace(ents=ents)
+
+    def pipe(self, textos, batch_size=256):
+        return (self(texto) for texto in textos)
+
+
+def classificar_sacado(sacado, nlp):
+    """Implementação original, linha a linha, mantida como referência."""
+    if not nlp or not sacado:
+        return 'Indefinido'
+    if any(suffix in sacado.upper() for suffix in COMPANY_SUFFIXES):
+        return 'PJ'
+    doc = nlp(sacado)
+    for ent in doc.ents:
+        if ent.label_ == 'ORG':
+            return 'PJ'
+        if ent.label_ == 'PER':
+            return 'PF'
+    if len(sacado.split()) <= 4:
+        return 'PF'
+    return 'Indefinido'
+
+
+SACADOS = [
+    'COMERCIAL XYZ LTDA',            # sufixo de empresa
+    'Maria da Silva',                # pessoa
+    'BANCO DO POVO',                 # organização
+    'MARIA BANCO',                   # pessoa antes da organização
+    'BANCO MARIA',                   # organização antes da pessoa
+    'DOHLER',                        # curto e ambíguo, sem entidade
+    'JOAO PEREIRA',                  # maiúsculas, sem entidade
+    'JOAO CARLOS PEREIRA DOS SANTOS NETO',  # mais de 4 palavras, sem entidade
+    'FLORIPA SC',                    # só entidade de outro tipo
+    'Ana',
+    '',
+    'Maria da Silva',                # repetido
+]
+
+
+class ClassificacaoTest(unittest.TestCase):
+
+    def test_lote_equivale_a_linha_a_linha(self):
+        nlp = NlpFalso()
+        sacados = pd.Series(SACADOS, dtype=object)
+        esperado = sacados.map(lambda s: classificar_sacado(s, nlp))
+        obtido = classificar_serie(None, sacados, nlp, batch_size=4)
+        pd.testing.assert_series_equal(obtido, esperado)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+"""
+Regressão da leitura de francesinhas: a extração vetorizada (ler_francesinha, nos modos padrão
+e streaming) deve produzir o mesmo DataFrame que a implementação original, linha a linha com iterrows.
+"""
+
+import io
+import re
+import unittest
+from datetime import datetime
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src.processors.francesinha import ler_francesinha
+
+COLUNAS_MAPEAMENTO = {
+    1: 'Sacado', 5: 'Nosso_Numero', 11: 'Seu_Numero', 13: 'Dt_Previsao_Credito',
+    18: 'Vencimento', 21: 'Dt_Limite_Pgto', 25: 'Valor_RS', 28: 'Vlr_Mora',
+    29: 'Vlr_Desc', 31: 'Vlr_Outros_Acresc', 34: 'Dt_Liquid', 35: 'Vlr_Cobrado',
+}
+
+
+def ler_francesinha_iterrows(arquivo_xls):
+    """Implementação original (processar_francesinha_xls do app), mantida como referência."""
+    df_raw = pd.read_excel(arquivo_xls, header=None)
+    dados_limpos = []
+    for idx, row in df_raw.iterrows():
+        sacado = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ''
+        nosso_numero = str(row.iloc[5]).strip() if pd.notna(row.iloc[5]) else ''
+        eh_linha_valida = (
+            sacado != '' and
+            len(sacado) > 3 and
+            not sacado.startswith('Sacado') and
+            nosso_numero != '' and
+            not bool(re.match(r'^\d+-[A-Z]', sacado)) and
+            not any(palavra in sacado.upper() for palavra in [
+                'ORDENADO', 'TIPO CONSULTA', 'CONTA CORRENTE',
+                'CEDENTE', 'RELATÓRIO', 'TOTAL', 'DATA INICIAL'
+            ])
+        )
+        if eh_linha_valida:
+            linha_dados = {}
+            for col_idx, nome_col in COLUNAS_MAPEAMENTO.items():
+                valor = row.iloc[col_idx] if col_idx < len(row) else None
+                if pd.notna(valor):
+                    if nome_col in ['Dt_Previsao_Credito', 'Vencimento', 'Dt_Limite_Pgto', 'Dt_Liquid']:
+                        if isinstance(valor, datetime):
+                            linha_dados[nome_col] = valor.strftime('%d/%m/%Y')
+                        else:
+                            linha_dados[nome_col] = str(valor)
+                    elif nome_col in ['Valor_RS', 'Vlr_Mora', 'Vlr_Desc', 'Vlr_Outros_Acresc', 'Vlr_Cobrado']:
+                        try:
+                            linha_dados[nome_col] = float(valor)
+                        except (TypeError, ValueError):
+                            linha_dados[nome_col] = 0.0
+                    else:
+                        linha_dados[nome_col] = str(valor).strip()
+                else:
+                    linha_dados[nome_col] = ''
+            dados_limpos.append(linha_dados)
+    if dados_limpos:
+        return pd.DataFrame(dados_limpos)[list(COLUNAS_MAPEAMENTO.values())]
+    return pd.DataFrame()
+
+
+def _linha(largura, **celulas):
+    """Linha da planilha com `largura` colunas; celulas usa os nomes de COLUNAS_MAPEAMENTO."""
+    linha = [None] * largura
+    posicoes = {nome: indice for indice, nome in COLUNAS_MAPEAMENTO.items()}
+    for nome, valor in celulas.items():
+        if posicoes[nome] < largura:
+            linha[posicoes[nome]] = valor
+    return linha
+
+
+def _boleto(largura, n, **extras):
+    celulas = dict(
+        Sacado=f'CLIENTE {n} LTDA', Nosso_Numero=f'{n:08d}-{n % 10}', Seu_Numero=f'NF {n}',
+        Dt_Previsao_Credito=datetime(2024, 1, n % 28 + 1), Vencimento=datetime(2024, 1, 10),
+        Dt_Limite_Pgto=datetime(2024, 2, 10), Valor_RS=100.0 + n, Vlr_Mora=(n % 3) * 1.5,
+        Vlr_Desc=0.0, Vlr_Outros_Acresc=0.25, Dt_Liquid=datetime(2024, 1, 15), Vlr_Cobrado=100.0 + n,
+    )
+    celulas.update(extras)
+    return _linha(largura, **celulas)
+
+
+def _planilha(linhas):
+    buffer = io.BytesIO()
+    pd.DataFrame(linhas).to_excel(buffer, header=False, index=False)
+    return buffer.getvalue()
+
+
+def planilha_completa():
+    """36 colunas, com cabeçalhos/rodapés, datas e valores mistos com texto."""
+    largura = 36
+    rotulos = {nome: nome.replace('_', ' ') for nome in COLUNAS_MAPEAMENTO.values()}
+    linhas = [
+        _linha(largura, Sacado='RELATÓRIO DE BOLETOS LIQUIDADOS'),
+        _linha(largura, Sacado='CEDENTE: EMPRESA EXEMPLO', Nosso_Numero='AG 1234'),
+        _linha(largura, Sacado='Data Inicial: 01/01/2024', Nosso_Numero='x'),
+        _linha(largura, **rotulos),
+    ]
+    for n in range(1, 31):
+        linhas.append(_boleto(largura, n))
+    linhas += [
+        # Datas em texto misturadas às datas do Excel
+        _boleto(largura, 31, Vencimento='10/01/2024', Dt_Liquid='sem data'),
+        # Valores não numéricos e células vazias
+        _boleto(largura, 32, Valor_RS='abc', Vlr_Mora=None, Vlr_Cobrado='1.234,56'),
+        _boleto(largura, 33, Seu_Numero=None, Dt_Previsao_Credito=None),
+        # Nosso número numérico e sacado com espaços nas pontas
+        _boleto(largura, 34, Nosso_Numero=987654, Sacado='  CLIENTE COM ESPACOS  '),
+        # Linhas descartadas
+        _boleto(largura, 35, Sacado='123-ABC AGRUPAMENTO'),
+        _boleto(largura, 36, Sacado='TOTAL DO DIA'),
+        _boleto(largura, 37, Sacado='Total geral'),
+        _boleto(largura, 38, Sacado='ABC'),
+        _boleto(largura, 39, Nosso_Numero=None),
+        _boleto(largura, 40, Sacado='Sacado: repetido'),
+        _boleto(largura, 41, Sacado='ORDENADO POR NOME'),
+        _linha(largura),
+    ]
+    return _planilha(linhas)
+
+
+def planilha_estreita():
+    """Menos de 36 colunas (Vlr_Outros_Acresc, Dt_Liquid e Vlr_Cobrado ausentes) e datas só do Excel."""
+    largura = 30
+    linhas = [
+        _linha(largura, Sacado='RELATÓRIO DE BOLETOS', Nosso_Numero='Nosso Número'),
+        _linha(largura, Sacado='Sacado', Nosso_Numero='Nosso Número', Valor_RS='Valor'),
+    ]
+    for n in range(1, 21):
+        linhas.append(_boleto(largura, n))
+    linhas.append(_boleto(largura, 21, Vlr_Desc='n/d'))
+    linhas.append(_linha(largura, Sacado='TOTAL', Nosso_Numero='-', Valor_RS=9999.0))
+    return _planilha(linhas)
+
+
+class LerFrancesinhaTest(unittest.TestCase):
+
+    def comparar(self, conteudo):
+        esperado = ler_francesinha_iterrows(io.BytesIO(conteudo))
+        self.assertFalse(esperado.empty)
+        assert_frame_equal(ler_francesinha(io.BytesIO(conteudo)), esperado)
+        assert_frame_equal(ler_francesinha(io.BytesIO(conteudo), streaming=True), esperado)
+
+    def test_planilha_completa(self):
+        self.comparar(planilha_completa())
+
+    def test_planilha_estreita(self):
+        self.comparar(planilha_estreita())
+
+    def test_sem_linhas_validas(self):
+        conteudo = _planilha([_linha(36, Sacado='RELATÓRIO'), _linha(36, Sacado='TOTAL', Nosso_Numero='1')])
+        self.assertTrue(ler_francesinha(io.BytesIO(conteudo)).empty)
+        self.assertTrue(ler_francesinha(io.BytesIO(conteudo), streaming=True).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
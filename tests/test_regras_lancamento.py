@@ -0,0 +1,28 @@
+"""
+Compilação das regras de lançamento: uma expressão regular inválida vinda do banco é ignorada
+com aviso, sem impedir a aplicação das demais regras.
+"""
+
+import unittest
+
+import pandas as pd
+
+from src.processors.regras_lancamento import aplicar_regras_lancamento, compilar_regras
+
+
+class TestRegrasLancamento(unittest.TestCase):
+    def test_regex_invalida_e_ignorada(self):
+        regras = [
+            {'prioridade': 1, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': 'TARIFA[', 'regex': True, 'debito': '1'},
+            {'prioridade': 2, 'tipo': 'DEBIT', 'campo': 'memo', 'padrao': r'TARIFA \d+', 'regex': True, 'debito': '2'},
+        ]
+        with self.assertLogs('src.processors.regras_lancamento', level='WARNING'):
+            compiladas = compilar_regras(regras)
+        self.assertEqual(len(compiladas), 1)
+
+        df = pd.DataFrame({'tipo': ['DEBIT'], 'memo': ['TARIFA 10'], 'payee': ['']})
+        self.assertEqual(aplicar_regras_lancamento(df, compiladas)['debito'].tolist(), ['2'])
+
+
+if __name__ == '__main__':
+    unittest.main()